@@ -1,7 +1,16 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
     verbose_name = 'API'
+
+    def ready(self):
+        from foodgram_backend.db import (
+            check_connections_health,
+            mark_connections_released
+        )
+        request_started.connect(check_connections_health)
+        request_finished.connect(mark_connections_released)
@@ -0,0 +1,64 @@
+from hashlib import md5
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    quote_etag,
+)
+from django.utils.http import http_date
+
+from recipes.versions import get_user_relations_version, version_to_datetime
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET (ETag / Last-Modified) для list и retrieve.
+    Вьюсет описывает валидаторы в get_conditional_validators;
+    при совпадении отдается 304 без сериализации.
+    """
+
+    def get_conditional_validators(self):
+        """
+        Возвращает (части ETag, дата изменения) или None,
+        если валидаторы посчитать нельзя.
+        """
+        raise NotImplementedError
+
+    def get_user_validators(self):
+        """Метка избранного/шоплиста/подписок текущего пользователя."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return 'anonymous', None
+        version = get_user_relations_version(user.pk)
+        return f'{user.pk}:{version}', version_to_datetime(version)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+    def conditional_response(self, request, view, *args, **kwargs):
+        validators = self.get_conditional_validators()
+        if validators is None:
+            return view(request, *args, **kwargs)
+        parts, last_modified = validators
+        etag = quote_etag(md5(
+            '|'.join(map(str, (request.get_full_path(), *parts))).encode()
+        ).hexdigest())
+        timestamp = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+            # Флаги в ответе зависят от пользователя
+            patch_vary_headers(response, ('Authorization',))
+        return response
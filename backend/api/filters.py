@@ -1,19 +1,7 @@
 from django_filters.rest_framework import filters, FilterSet
 
-from recipes.models import Recipe, Tag, Ingredient
-
-
-class IngredientFilter(FilterSet):
-    """Фильтр по имени для ингредиентов"""
-    name = filters.CharFilter(
-        field_name='name',
-        # Ищем значения, начинающиеся с указанной строки, игнорируя регистр
-        lookup_expr='istartswith',
-    )
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
 
 class RecipeFilter(FilterSet):
@@ -29,6 +17,7 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
@@ -36,7 +25,8 @@ class RecipeFilter(FilterSet):
             'author',
             'tags',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search'
         )
 
     def get_is_favorited(self, queryset, name, value):
@@ -56,3 +46,7 @@ class RecipeFilter(FilterSet):
                 shoplist_recipes__user=user
             )
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск, результаты по релевантности"""
+        return search_recipes(queryset, value)
@@ -0,0 +1,174 @@
+"""
+Метрики Prometheus, отдаются по /metrics в текстовом формате.
+
+Под gunicorn у каждого воркера свои счетчики, поэтому задается
+PROMETHEUS_MULTIPROC_DIR: prometheus_client пишет значения в файлы
+общего каталога, а /metrics собирает их со всех воркеров
+(каталог очищается при старте, см. gunicorn.conf.py).
+
+Доступ только с адресов из METRICS_ALLOWED_IPS (адреса и подсети)
+или с заголовком Authorization: Bearer <METRICS_TOKEN>, если токен задан.
+"""
+import hmac
+import ipaddress
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+from foodgram_backend.db import pool_connection_opened
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'Запросы по маршрутам API.',
+    ('route', 'method', 'status')
+)
+REQUEST_DURATION = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса.',
+    ('route', 'method')
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries_total',
+    'SQL-запросы, выполненные при обработке запросов.',
+    ('route',)
+)
+DB_CONNECTIONS = Counter(
+    'foodgram_db_connections_opened_total',
+    'Соединения, открытые с сервером базы.',
+    ('alias',)
+)
+DB_POOL_CHECKOUTS = Counter(
+    'foodgram_db_pool_checkouts_total',
+    'Выдачи соединений из пула процесса.',
+    ('alias',)
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшам ответов и списков покупок.',
+    ('cache', 'result')
+)
+RELATION_WRITES = Counter(
+    'foodgram_relation_writes_total',
+    'Добавления и удаления избранного, шоплиста и подписок.',
+    ('relation', 'operation')
+)
+SHOPPING_LIST_DURATION = Histogram(
+    'foodgram_shopping_list_seconds',
+    'Время формирования файла списка покупок.',
+    ('format',)
+)
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Счетчик и время запросов по маршруту. Маршрут - имя URL
+    ("api:recipes-list", "api:recipes-favorite"), а не путь,
+    чтобы id в адресе не плодили отдельные серии.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        route = match.view_name if match else UNMATCHED_ROUTE
+        REQUESTS.labels(route, request.method, response.status_code).inc()
+        REQUEST_DURATION.labels(route, request.method).observe(duration)
+        if counter.queries:
+            DB_QUERIES.labels(route).inc(counter.queries)
+        return response
+
+
+def count_connection(sender, connection, **kwargs):
+    # У пула connection_created - выдача, а не новое соединение:
+    # новые он сообщает сигналом pool_connection_opened
+    if hasattr(connection, 'get_pool'):
+        DB_POOL_CHECKOUTS.labels(connection.alias).inc()
+    else:
+        DB_CONNECTIONS.labels(connection.alias).inc()
+
+
+def count_pool_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS.labels(connection.alias).inc()
+
+
+connection_created.connect(count_connection)
+pool_connection_opened.connect(count_pool_connection)
+
+
+def observe_stream(chunks, file_format, started):
+    """
+    Отдает части файла и записывает время их формирования без учета
+    ожидания клиента между частями.
+    """
+    elapsed = time.perf_counter() - started
+    chunks = iter(chunks)
+    while True:
+        chunk_started = time.perf_counter()
+        chunk = next(chunks, None)
+        elapsed += time.perf_counter() - chunk_started
+        if chunk is None:
+            break
+        yield chunk
+    SHOPPING_LIST_DURATION.labels(file_format).observe(elapsed)
+
+
+def is_metrics_allowed(request):
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def metrics(request):
+    if not is_metrics_allowed(request):
+        return HttpResponseForbidden()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
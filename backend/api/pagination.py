@@ -1,8 +1,132 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import (
     PageNumberPagination
 )
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк из плана запроса PostgreSQL без COUNT(*).
+    На других базах возвращает точное значение.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class RecipePagination(CustomPagination):
+    """
+    Постраничная пагинация по умолчанию и keyset-режим по запросу.
+    Keyset включается параметром cursor (пустой - первая страница):
+    страница выбирается условием по (created_at, id) вместо OFFSET,
+    COUNT(*) не выполняется, а count=estimate добавляет оценку
+    количества из плана запроса.
+    Поиск сортирует по релевантности, а не по (created_at, id),
+    поэтому вместе с search курсор игнорируется и выдача постраничная.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordered_query_params = ('search',)
+    ordering = ('-created_at', '-id')
+    keyset_only = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.keyset_only and (
+            self.cursor_query_param not in request.query_params
+            or any(
+                request.query_params.get(param)
+                for param in self.ordered_query_params
+            )
+        ):
+            self.keyset = False
+            return super().paginate_queryset(queryset, request, view)
+        self.keyset = True
+        self.request = request
+        self.estimated_count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.estimated_count = estimate_count(queryset.order_by())
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        if position is not None:
+            created_at, pk = position
+            # Верхняя граница по created_at позволяет идти по индексу
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at)
+                | Q(created_at=created_at, pk__lt=pk),
+                created_at__lte=created_at,
+            )
+        page_size = self.get_page_size(request)
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        response = {
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        }
+        if self.estimated_count is not None:
+            response = {'count': self.estimated_count, **response}
+        return Response(response)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.count_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last)
+        )
+
+    def encode_cursor(self, recipe):
+        value = f'{recipe.created_at.isoformat()}|{recipe.pk}'
+        return urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            created_at, pk = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound('Неверный курсор.')
+
+
+class TimelinePagination(RecipePagination):
+    """
+    Ленту подписок отдаем только в keyset-режиме: она всегда
+    хронологическая, поиск в ней только отбирает рецепты.
+    """
+    keyset_only = True
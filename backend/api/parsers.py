@@ -0,0 +1,41 @@
+"""
+JSON с ограничением размера тела запроса.
+
+DATA_UPLOAD_MAX_MEMORY_SIZE проверяется только в request.body и
+разборе форм, а JSONParser DRF читает поток напрямую. Поэтому размер
+проверяем сами: по Content-Length до чтения и по фактически
+прочитанному, если заголовок занижен.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class RequestTooLarge(ParseError):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Тело запроса больше {max_size} байт.'
+    default_code = 'request_too_large'
+
+    def __init__(self, max_size):
+        super().__init__(self.default_detail.format(max_size=max_size))
+
+
+class LimitedJSONParser(JSONParser):
+    """JSONParser, отклоняющий тела больше API_REQUEST_MAX_SIZE."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        max_size = settings.API_REQUEST_MAX_SIZE
+        request = (parser_context or {}).get('request')
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (AttributeError, ValueError):
+            length = 0
+        if length > max_size:
+            raise RequestTooLarge(max_size)
+        body = stream.read(max_size + 1)
+        if len(body) > max_size:
+            raise RequestTooLarge(max_size)
+        return super().parse(BytesIO(body), media_type, parser_context)
@@ -0,0 +1,271 @@
+"""
+Профилирование запросов API, включается PROFILING_ENABLED.
+
+Для каждого запроса к вьюсетам DRF считаются число SQL-запросов,
+время SQL, время сериализации, размер ответа и общее время.
+Статистика копится в памяти процесса по ключу "Вьюсет.action":
+последние PROFILING_SAMPLES значений каждой метрики для перцентилей
+и повторяющиеся формы SQL (признак N+1). Раз в PROFILING_FLUSH_INTERVAL
+секунд снимок процесса пишется в кэш Django, откуда отчеты всех
+воркеров собирают эндпоинт /api/profiling/ и команда profiling_report.
+"""
+import os
+import re
+import socket
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from foodgram_backend.constants import (
+    PROFILING_CACHE_TIMEOUT,
+    PROFILING_FLUSH_INTERVAL,
+    PROFILING_SAMPLES
+)
+
+WORKERS_KEY = 'profiling:workers'
+WORKER_KEY = 'profiling:worker:{name}'
+METRICS = ('duration', 'queries', 'sql_time', 'serializer_time', 'size')
+PERCENTILES = (50, 95, 99)
+# Списки IN (%s, %s, ...) разной длины считаем одной формой
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+_flushed_at = 0
+WORKER_NAME = f'{socket.gethostname()}:{os.getpid()}'
+
+
+def get_sql_shape(sql):
+    """SQL без значений: параметры уже вынесены в %s, убираем остальное."""
+    return NUMBER.sub('N', IN_LIST.sub('IN (...)', sql))
+
+
+class RequestProfile:
+    """Счетчики одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0
+        self.serializer_time = 0
+        self.serializer_depth = 0
+        self.shapes = Counter()
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[get_sql_shape(sql)] += 1
+
+
+def install_serializer_timer():
+    """
+    Оборачивает BaseSerializer.data: учитывается только внешний
+    вызов, вложенные сериализаторы входят в его время.
+    """
+    if getattr(BaseSerializer, '_profiling_installed', False):
+        return
+    original = BaseSerializer.data.fget
+
+    def data(self):
+        profile = getattr(_local, 'profile', None)
+        if profile is None or profile.serializer_depth:
+            return original(self)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            profile.serializer_depth -= 1
+            profile.serializer_time += time.perf_counter() - started
+
+    BaseSerializer.data = property(data)
+    BaseSerializer._profiling_installed = True
+
+
+def get_endpoint(request, view_func):
+    """Имя эндпоинта "Вьюсет.action", для не-DRF представлений None."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return None
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+def record(endpoint, profile, duration, size):
+    duplicates = [
+        (shape, count) for shape, count in profile.shapes.items()
+        if count > 1
+    ]
+    values = (
+        duration * 1000,
+        profile.queries,
+        profile.sql_time * 1000,
+        profile.serializer_time * 1000,
+        size,
+    )
+    with _lock:
+        stats = _stats.get(endpoint)
+        if stats is None:
+            stats = _stats[endpoint] = {
+                'requests': 0,
+                'samples': {
+                    metric: deque(maxlen=PROFILING_SAMPLES)
+                    for metric in METRICS
+                },
+                'duplicates': {},
+            }
+        stats['requests'] += 1
+        for metric, value in zip(METRICS, values):
+            if value is not None:
+                stats['samples'][metric].append(value)
+        for shape, count in duplicates:
+            # [запросов с повтором, максимум повторов за запрос]
+            flagged = stats['duplicates'].setdefault(shape, [0, 0])
+            flagged[0] += 1
+            flagged[1] = max(flagged[1], count)
+    if time.monotonic() - _flushed_at >= PROFILING_FLUSH_INTERVAL:
+        flush()
+
+
+def get_snapshot():
+    with _lock:
+        return {
+            endpoint: {
+                'requests': stats['requests'],
+                'samples': {
+                    metric: list(samples)
+                    for metric, samples in stats['samples'].items()
+                },
+                'duplicates': {
+                    shape: list(flagged)
+                    for shape, flagged in stats['duplicates'].items()
+                },
+            }
+            for endpoint, stats in _stats.items()
+        }
+
+
+def flush():
+    """Пишет снимок процесса в кэш и регистрирует воркер."""
+    global _flushed_at
+    _flushed_at = time.monotonic()
+    cache.set(
+        WORKER_KEY.format(name=WORKER_NAME),
+        get_snapshot(),
+        PROFILING_CACHE_TIMEOUT
+    )
+    workers = cache.get(WORKERS_KEY, set())
+    if WORKER_NAME not in workers:
+        cache.set(WORKERS_KEY, workers | {WORKER_NAME}, None)
+
+
+def reset():
+    """Очищает статистику процесса и снимки всех воркеров в кэше."""
+    with _lock:
+        _stats.clear()
+    workers = cache.get(WORKERS_KEY, set())
+    cache.delete_many(
+        [WORKER_KEY.format(name=name) for name in workers] + [WORKERS_KEY]
+    )
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return None
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return round(values[index], 2)
+
+
+def get_report(duplicates_limit=5):
+    """
+    Отчет по всем воркерам: сумма запросов, перцентили по общей
+    выборке и самые частые повторяющиеся формы SQL.
+    """
+    if _stats:
+        flush()
+    workers = cache.get(WORKERS_KEY, set())
+    snapshots = cache.get_many(
+        [WORKER_KEY.format(name=name) for name in workers]
+    ).values()
+    merged = {}
+    for snapshot in snapshots:
+        for endpoint, stats in snapshot.items():
+            total = merged.setdefault(endpoint, {
+                'requests': 0,
+                'samples': {metric: [] for metric in METRICS},
+                'duplicates': {},
+            })
+            total['requests'] += stats['requests']
+            for metric, values in stats['samples'].items():
+                total['samples'][metric].extend(values)
+            for shape, (requests, repeats) in stats['duplicates'].items():
+                flagged = total['duplicates'].setdefault(shape, [0, 0])
+                flagged[0] += requests
+                flagged[1] = max(flagged[1], repeats)
+    report = {}
+    for endpoint, stats in sorted(merged.items()):
+        metrics = {}
+        for metric, values in stats['samples'].items():
+            values.sort()
+            metrics[metric] = {
+                f'p{percent}': percentile(values, percent)
+                for percent in PERCENTILES
+            }
+            metrics[metric]['max'] = percentile(values, 100)
+        duplicates = sorted(
+            stats['duplicates'].items(),
+            key=lambda item: item[1],
+            reverse=True
+        )[:duplicates_limit]
+        report[endpoint] = {
+            'requests': stats['requests'],
+            'metrics': metrics,
+            'duplicate_queries': [
+                {'sql': shape, 'requests': requests, 'max_repeats': repeats}
+                for shape, (requests, repeats) in duplicates
+            ],
+        }
+    return report
+
+
+class ProfilingMiddleware:
+    """Снимает метрики запросов к вьюсетам DRF."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_serializer_timer()
+
+    def __call__(self, request):
+        profile = _local.profile = RequestProfile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        duration = time.perf_counter() - started
+        endpoint = getattr(request, 'profiling_endpoint', None)
+        if endpoint is not None:
+            # Размер потокового ответа заранее неизвестен
+            size = None if response.streaming else len(response.content)
+            record(endpoint, profile, duration, size)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.profiling_endpoint = get_endpoint(request, view_func)
@@ -0,0 +1,66 @@
+"""
+Связи текущего пользователя с рецептами и авторами.
+
+Флаги is_favorited, is_in_shopping_cart и is_subscribed проверяются
+по множествам id, которые загружаются один раз на запрос. Между
+запросами множества хранятся в кэше Django под версией связей
+пользователя, которую меняют действия favorite, shopping_cart
+и subscribe.
+"""
+from django.core.cache import cache
+
+from foodgram_backend.constants import USER_RELATIONS_CACHE_TIMEOUT
+from foodgram_backend.replicas import use_primary
+from recipes.models import Favourite, Shoplist
+from recipes.versions import get_user_relations_version
+from users.models import Follow
+
+RELATIONS_KEY = 'users:{user_id}:relations:{version}'
+
+
+class UserRelations:
+    """Id рецептов в избранном и шоплисте и id авторов в подписках."""
+    __slots__ = ('favourites', 'shoplist', 'following')
+
+    def __init__(self, favourites=(), shoplist=(), following=()):
+        self.favourites = frozenset(favourites)
+        self.shoplist = frozenset(shoplist)
+        self.following = frozenset(following)
+
+
+NO_RELATIONS = UserRelations()
+
+
+def load_user_relations(user):
+    return UserRelations(
+        favourites=Favourite.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        ),
+        shoplist=Shoplist.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        ),
+        following=Follow.objects.filter(follower=user).values_list(
+            'following_id', flat=True
+        ),
+    )
+
+
+def get_user_relations(request):
+    """Связи пользователя запроса, один раз на запрос."""
+    if request is None or not request.user.is_authenticated:
+        return NO_RELATIONS
+    relations = getattr(request, '_user_relations', None)
+    if relations is not None:
+        return relations
+    user = request.user
+    key = RELATIONS_KEY.format(
+        user_id=user.pk, version=get_user_relations_version(user.pk)
+    )
+    relations = cache.get(key)
+    if relations is None:
+        # Кэшируется под текущей версией, реплика могла отстать
+        with use_primary():
+            relations = load_user_relations(user)
+        cache.set(key, relations, USER_RELATIONS_CACHE_TIMEOUT)
+    request._user_relations = relations
+    return relations
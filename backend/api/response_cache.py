@@ -0,0 +1,119 @@
+"""
+Кэш готовых ответов списка и карточки рецепта для анонимов.
+
+У анонима флаги избранного и шоплиста всегда false, поэтому ответ
+зависит только от параметров запроса. Запись хранится под ключом
+нормализованных параметров вместе с поколением рецептов и версией
+справочников и считается актуальной, пока они совпадают с текущими.
+Поколение меняют сигналы сохранения и удаления рецепта.
+
+От лавины одинаковых запросов после сброса защищает блокировка:
+ответ пересчитывает один запрос, остальные отдают прежнюю запись,
+а если ее нет - коротко ждут новую.
+"""
+import time
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from api.metrics import CACHE_REQUESTS
+from foodgram_backend.constants import (
+    RECIPE_RESPONSE_CACHE_TIMEOUT,
+    RECIPE_RESPONSE_LOCK_TIMEOUT,
+    RECIPE_RESPONSE_WAIT_TIMEOUT
+)
+from foodgram_backend.replicas import use_primary
+from recipes.catalog import get_catalog_version
+from recipes.versions import RECIPES_GENERATION_KEY, get_version
+
+RESPONSE_KEY = 'recipes:response:{digest}'
+LOCK_KEY = 'recipes:response:{digest}:lock'
+WAIT_STEP = 0.05
+
+
+class AnonymousResponseCacheMixin:
+    """Кэширует JSON-ответы list и retrieve для анонимных запросов."""
+    response_cache_params = ('tags', 'author', 'page', 'limit', 'search')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+    def get_response_cache_digest(self, request):
+        """Ключ по нормализованным параметрам или None для прочих."""
+        params = request.query_params
+        if not set(params) <= set(self.response_cache_params):
+            return None
+        normalized = tuple(
+            (name, tuple(sorted(set(params.getlist(name)))))
+            for name in self.response_cache_params
+            if name in params
+        )
+        # Хост входит в ключ из-за абсолютных ссылок next/previous
+        raw = repr((
+            request.get_host(),
+            self.action,
+            self.kwargs.get(self.lookup_field),
+            normalized,
+        ))
+        return md5(raw.encode()).hexdigest()
+
+    def cached_response(self, request, view, *args, **kwargs):
+        if (
+            request.user.is_authenticated
+            or request.accepted_renderer.format != 'json'
+        ):
+            return view(request, *args, **kwargs)
+        digest = self.get_response_cache_digest(request)
+        if digest is None:
+            return view(request, *args, **kwargs)
+        key = RESPONSE_KEY.format(digest=digest)
+        generation = (
+            get_version(RECIPES_GENERATION_KEY), get_catalog_version()
+        )
+        entry = cache.get(key)
+        if entry is not None and entry[0] == generation:
+            CACHE_REQUESTS.labels('recipe_response', 'hit').inc()
+            return self.build_cached_response(entry)
+        CACHE_REQUESTS.labels('recipe_response', 'miss').inc()
+
+        lock_key = LOCK_KEY.format(digest=digest)
+        if not cache.add(lock_key, 1, RECIPE_RESPONSE_LOCK_TIMEOUT):
+            # Ответ уже пересчитывает другой запрос
+            if entry is not None:
+                return self.build_cached_response(entry)
+            deadline = time.monotonic() + RECIPE_RESPONSE_WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(WAIT_STEP)
+                entry = cache.get(key)
+                if entry is not None and entry[0] == generation:
+                    return self.build_cached_response(entry)
+            return view(request, *args, **kwargs)
+        try:
+            # Ответ кэшируется под текущим поколением, поэтому строим
+            # его по основной базе, а не по отставшей реплике
+            with use_primary():
+                response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                # Рендерим здесь, чтобы сохранить готовые байты
+                response.accepted_renderer = request.accepted_renderer
+                response.accepted_media_type = request.accepted_media_type
+                response.renderer_context = self.get_renderer_context()
+                response.render()
+                cache.set(
+                    key,
+                    (generation, response.content, response['Content-Type']),
+                    RECIPE_RESPONSE_CACHE_TIMEOUT
+                )
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    def build_cached_response(self, entry):
+        _, content, content_type = entry
+        return HttpResponse(content, content_type=content_type)
@@ -1,15 +1,23 @@
 import base64
+from tempfile import SpooledTemporaryFile
+
 import webcolors
 
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from django.db import transaction
-from django.shortcuts import get_object_or_404
-from django.core.files.base import ContentFile
+from django.db.models import F, Prefetch, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
+from PIL import Image
 from rest_framework import serializers
 
+from api.relations import get_user_relations
+from api.shopping_list import invalidate_recipe_shopping_lists
+from recipes.catalog import get_catalog
 from recipes.models import (
     Tag,
     Recipe,
@@ -28,6 +36,44 @@ from recipes.validators import (
 User = get_user_model()
 
 
+def get_recipe_prefetches():
+    """Предзагрузка тегов и ингредиентов для RecipeGetSerializer."""
+    return (
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch(
+            'ingredient_recipes',
+            queryset=IngredientRecipe.objects.select_related(
+                'ingredient__measurement_unit'
+            )
+        ),
+    )
+
+
+def resolve_ids(rows, model, ids):
+    """
+    Находит объекты по id в снимке справочника, а отсутствующие
+    в нем (снимок еще не обновился) добирает одним in_bulk.
+    """
+    found = {pk: rows[pk] for pk in ids if pk in rows}
+    missing = set(ids) - found.keys()
+    if missing:
+        found.update(model.objects.in_bulk(missing))
+    return found
+
+
+BASE64_MARKER = ';base64,'
+# Кратно 4, чтобы части декодировались независимо
+BASE64_CHUNK = 64 * 1024
+# До этого размера декодированное изображение держим в памяти
+IMAGE_SPOOL_SIZE = 1024 * 1024
+IMAGE_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+
 class Hex2NameColor(serializers.Field):
     def to_representation(self, value):
         return value
@@ -41,12 +87,109 @@ class Hex2NameColor(serializers.Field):
 
 
 class Base64ImageField(serializers.ImageField):
+    """
+    Принимает изображение в base64. Отдает ссылку на копию размера
+    rendition (или image_rendition из контекста), пока ее нет - оригинал.
+    """
+    default_error_messages = {
+        'too_large': 'Изображение больше {max_size} байт.',
+        'too_many_pixels': 'Изображение больше {max_pixels} пикселей.',
+    }
+
+    def __init__(self, *args, rendition=None, **kwargs):
+        self.rendition = rendition
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, value):
+        rendition = self.rendition or self.context.get('image_rendition')
+        path = value and value.instance.image_renditions.get(rendition)
+        if not path:
+            return super().to_representation(value)
+        url = value.storage.url(path)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+        if not (isinstance(data, str) and data.startswith('data:image')):
+            return super().to_internal_value(data)
+        start = data.find(BASE64_MARKER)
+        if start == -1:
+            self.fail('invalid_image')
+        start += len(BASE64_MARKER)
+        # Размер после декодирования известен заранее, большие
+        # изображения отклоняем до выделения памяти под них
+        if (len(data) - start) * 3 // 4 > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        file = self.decode(data, start)
+        try:
+            image_format = self.check_image(file)
+        except Exception:
+            file.close()
+            raise
+        size = file.tell()
+        file.seek(0)
+        return UploadedFile(
+            file,
+            name=f'temp.{IMAGE_EXTENSIONS[image_format]}',
+            content_type=Image.MIME[image_format],
+            size=size,
+        )
+
+    def decode(self, data, start):
+        """Декодирует base64 частями во временный файл."""
+        file = SpooledTemporaryFile(max_size=IMAGE_SPOOL_SIZE)
+        rest = ''
+        try:
+            for position in range(start, len(data), BASE64_CHUNK):
+                chunk = rest + ''.join(
+                    data[position:position + BASE64_CHUNK].split()
+                )
+                # Декодируем только полные группы из 4 символов
+                end = len(chunk) // 4 * 4
+                rest = chunk[end:]
+                file.write(base64.b64decode(chunk[:end], validate=True))
+                if file.tell() > settings.RECIPE_IMAGE_MAX_SIZE:
+                    self.fail(
+                        'too_large',
+                        max_size=settings.RECIPE_IMAGE_MAX_SIZE
+                    )
+            if rest:
+                self.fail('invalid_image')
+        except ValueError:
+            file.close()
+            self.fail('invalid_image')
+        except serializers.ValidationError:
+            file.close()
+            raise
+        return file
+
+    def check_image(self, file):
+        """
+        Формат и размеры читаются из заголовка, пиксели не распаковываются.
+        verify() проходит файл целиком, тоже без распаковки.
+        """
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                image_format = image.format
+                width, height = image.size
+                if image_format not in IMAGE_EXTENSIONS:
+                    self.fail('invalid_image')
+                if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+                    self.fail(
+                        'too_many_pixels',
+                        max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS
+                    )
+                image.verify()
+        except Image.DecompressionBombError:
+            self.fail(
+                'too_many_pixels',
+                max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS
+            )
+        except (OSError, SyntaxError, ValueError):
+            self.fail('invalid_image')
+        file.seek(0, 2)
+        return image_format
 
 
 class UserSerializer(DjoserUserSerializer):
@@ -86,13 +229,8 @@ class UserSerializer(DjoserUserSerializer):
         return super(UserSerializer, self).create(validated_data)
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return (
-            request.user.is_authenticated and Follow.objects.filter(
-                follower=request.user,
-                following=obj
-            ).exists()
-        )
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.following
 
 
 class CurrentUserSerializer(serializers.ModelSerializer):
@@ -111,13 +249,8 @@ class CurrentUserSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return (
-            request.user.is_authenticated and Follow.objects.filter(
-                follower=request.user,
-                following=obj
-            ).exists()
-        )
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.following
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -138,23 +271,22 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientSubSerializer(serializers.ModelSerializer):
-    """Вложенный сериалайзер рецепта, отдающий ингредиенты с количеством"""
-    measurement_unit = serializers.StringRelatedField(
-        source='measurement_unit.t_name'
+    """
+    Вложенный сериалайзер рецепта, отдающий ингредиенты с количеством.
+    Работает по строкам IngredientRecipe конкретного рецепта,
+    поэтому количество всегда относится к отображаемому рецепту.
+    """
+    id = serializers.IntegerField(source='ingredient.id', read_only=True)
+    name = serializers.CharField(source='ingredient.name', read_only=True)
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit.t_name',
+        read_only=True
     )
-    amount = serializers.SerializerMethodField()
-    name = serializers.CharField(read_only=True)
 
     class Meta:
-        model = Ingredient
+        model = IngredientRecipe
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
-    def get_amount(self, obj):
-        ingredient_recipe = obj.ingredient_recipes.first()
-        if ingredient_recipe:
-            return ingredient_recipe.amount
-        return None
-
 
 class IngredientInsertSerializer(serializers.ModelSerializer):
     """Вложенный сериалайзер создания рецепта для ингредиентов."""
@@ -197,28 +329,22 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     """Сериалайзер для получения информации о рецептах."""
     tags = TagSerializer(many=True, required=False)
     author = UserSerializer()
-    ingredients = IngredientSubSerializer(many=True, required=False)
+    ingredients = IngredientSubSerializer(
+        source='ingredient_recipes',
+        many=True,
+        required=False
+    )
     image = Base64ImageField(required=False, allow_null=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     def get_is_favorited(self, obj):
-        request = self.context['request']
-        return (
-            request.user.is_authenticated and Favourite.objects.filter(
-                user=request.user,
-                recipe=obj
-            ).exists()
-        )
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.favourites
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context['request']
-        return (
-            request.user.is_authenticated and Shoplist.objects.filter(
-                user=request.user,
-                recipe=obj
-            ).exists()
-        )
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.shoplist
 
     class Meta:
         model = Recipe
@@ -228,11 +354,19 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         ]
 
 
+class RecipeMatchSerializer(RecipeGetSerializer):
+    """Рецепт из подбора по ингредиентам."""
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + ['missing_ingredients']
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериалайзер для создания рецепта с переопределением."""
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
+    # Теги приходят списком id и разрешаются разом в validate_tags
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
         required=True
     )
     author = UserSerializer(read_only=True)
@@ -263,13 +397,13 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'tags': 'Попытка добавить два или более идентичных тега.'
             })
-        # Проверяем, что переданные теги существуют в базе
-        for tag in value:
-            if not Tag.objects.filter(pk=tag.pk).exists():
-                raise serializers.ValidationError({
-                    'tags': 'Тэг отсутствует в базе данных.'
-                })
-        return value
+        # Проверяем, что переданные теги существуют в справочнике
+        tags = resolve_ids(get_catalog().tags, Tag, value)
+        if len(tags) != len(uniq_tags):
+            raise serializers.ValidationError({
+                'tags': 'Тэг отсутствует в базе данных.'
+            })
+        return [tags[pk] for pk in value]
 
     def validate_ingredients(self, value):
         if not value:
@@ -287,7 +421,11 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'ingredients': 'Попытка добавить идентичные ингредиента.'
             })
-        # Проверяем наличие ингредиентов в базе данных и их количество
+        # Проверяем наличие ингредиентов в справочнике и их количество,
+        # найденные объекты сохраняем для создания IngredientRecipe
+        found = resolve_ids(
+            get_catalog().ingredients, Ingredient, uniq_ingredients
+        )
         for item in value:
             ingredient = item['id']
             amount = item['amount']
@@ -295,10 +433,11 @@ class RecipeSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({
                     'amount': f'Кол-во ингредиента id {ingredient} < 1.'
                 })
-            if not Ingredient.objects.filter(pk=ingredient).exists():
+            if ingredient not in found:
                 raise serializers.ValidationError({
                     'ingredients': f'Ингредиента с id {ingredient} нет в базе'
                 })
+            item['ingredient'] = found[ingredient]
         return value
 
     @transaction.atomic
@@ -306,19 +445,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         # Создание связей с ингредиентами
         ingredient_recipe_list = []
         for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data['id']
-            amount = ingredient_data['amount']
-            # Получаем объект ингредиента
-            ingredient = get_object_or_404(Ingredient, id=ingredient_id)
-            # Создаем объект IngredientRecipe и добавляем в список
+            # Ингредиент уже найден в validate_ingredients
             ingredient_recipe = IngredientRecipe(
                 recipe=instance,
-                ingredient=ingredient,
-                amount=amount
+                ingredient=ingredient_data['ingredient'],
+                amount=ingredient_data['amount']
             )
             ingredient_recipe_list.append(ingredient_recipe)
         # Добавляем все связи в базу данных
-        IngredientRecipe.objects.bulk_create(ingredient_recipe_list)
+        if ingredient_recipe_list:
+            IngredientRecipe.objects.bulk_create(ingredient_recipe_list)
 
     @transaction.atomic
     def create(self, validated_data):
@@ -326,6 +462,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags_data = validated_data.pop('tags', [])
         ingredients_data = validated_data.pop('ingredients')
         # Создание рецепта с автором
+        # recipes_count автора увеличивает сигнал post_save
         recipe = Recipe.objects.create(**validated_data)
         # Создание связей с тегами
         recipe.tags.set(tags_data)
@@ -335,30 +472,108 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        # Извлекаем данные о тегах и ингредиентах из валидированных данных
-        ingredients_data = validated_data.pop('ingredients', [])
-        self.validate_ingredients(ingredients_data)
-        tags_data = validated_data.pop('tags', [])
-        self.validate_tags(tags_data)
-        # Очищаем все связи с тегами и ингредиентами
-        instance.tags.clear()
-        instance.ingredients.clear()
-        # Добавляем новые связи с тегами
-        for tag in tags_data:
-            instance.tags.add(tag)
-        # Создаем новые связи с ингредиентами
-        self.process_ingredients(instance, ingredients_data)
+        # Связи трогаем, только если поле пришло в запросе
+        ingredients_data = validated_data.pop('ingredients', None)
+        tags_data = validated_data.pop('tags', None)
+        if tags_data is not None:
+            self.update_tags(instance, tags_data)
+        if ingredients_data is not None:
+            self.update_ingredients(instance, ingredients_data)
+            invalidate_recipe_shopping_lists(instance.pk)
         return super().update(instance, validated_data)
 
+    def update_tags(self, instance, tags_data):
+        # Удаляем только убранные теги и добавляем только новые
+        current = {tag.pk for tag in instance.tags.all()}
+        new = {tag.pk for tag in tags_data}
+        if current - new:
+            instance.tags.remove(*(current - new))
+        if new - current:
+            instance.tags.add(*(new - current))
+
+    def update_ingredients(self, instance, ingredients_data):
+        current = {
+            row.ingredient_id: row
+            for row in instance.ingredient_recipes.all()
+        }
+        new = {item['id']: item for item in ingredients_data}
+        removed = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in new
+        ]
+        if removed:
+            IngredientRecipe.objects.filter(pk__in=removed).delete()
+        changed = []
+        for ingredient_id, item in new.items():
+            row = current.get(ingredient_id)
+            if row is not None and row.amount != item['amount']:
+                row.amount = item['amount']
+                changed.append(row)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        self.process_ingredients(instance, [
+            item for ingredient_id, item in new.items()
+            if ingredient_id not in current
+        ])
+
     def to_representation(self, instance):
-        return RecipeGetSerializer(
-            instance,
-            context={'request': self.context.get('request')}
-        ).data
+        # После создания или изменения связи подгружаем одним планом,
+        # а не запросом на каждый ингредиент
+        prefetched = getattr(instance, '_prefetched_objects_cache', {})
+        if 'ingredient_recipes' not in prefetched:
+            prefetch_related_objects([instance], *get_recipe_prefetches())
+        return RecipeGetSerializer(instance, context=self.context).data
+
+
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None."""
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def get_author_recipes(author_ids, limit=None):
+    """
+    Рецепты нескольких авторов одним запросом: не больше limit
+    последних на каждого автора через ROW_NUMBER() OVER (PARTITION BY).
+    Возвращает словарь author_id -> список рецептов.
+    """
+    if not author_ids:
+        # Для пустого IN Django не строит SQL (EmptyResultSet)
+        return {}
+    queryset = Recipe.objects.filter(author_id__in=author_ids).only(
+        'id', 'name', 'image', 'image_renditions', 'cooking_time',
+        'author_id', 'created_at'
+    )
+    if limit is None:
+        recipes = queryset.order_by('-created_at', '-id')
+    else:
+        ranked = queryset.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('created_at').desc(), F('id').desc()],
+            )
+        ).order_by()
+        # Django 3.2 не умеет фильтровать по оконной функции,
+        # поэтому ограничение накладывается во внешнем запросе
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+            f'ORDER BY created_at DESC, id DESC',
+            (*params, limit)
+        )
+    author_recipes = {}
+    for recipe in recipes:
+        author_recipes.setdefault(recipe.author_id, []).append(recipe)
+    return author_recipes
 
 
 class FollowRecipeInsertSerializer(serializers.ModelSerializer):
     """Сабсериалайзер рецептов автора, на кого подписан пользователь."""
+    image = Base64ImageField(rendition='thumbnail', read_only=True)
 
     class Meta:
         model = Recipe
@@ -390,26 +605,21 @@ class FollowCreateListSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        # Получаем текущего пользователя из контекста запроса
-        current_user = self.context['request'].user
-        # Проверяем, подписан ли текущий пользователь на пользователя obj
-        return obj.followers.filter(follower=current_user).exists()
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.following
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(
-            author=obj
-        ).count()
+        return obj.recipes_count
 
     def get_recipes_and_limit(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = Recipe.objects.filter(
-            author=obj
-        ).all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        # Для страницы подписок рецепты всех авторов загружены заранее
+        author_recipes = self.context.get('author_recipes')
+        if author_recipes is None:
+            author_recipes = get_author_recipes(
+                [obj.pk], get_recipes_limit(self.context['request'])
+            )
         serializer = FollowRecipeInsertSerializer(
-            recipes,
+            author_recipes.get(obj.pk, []),
             many=True,
             read_only=True
         )
@@ -419,14 +629,8 @@ class FollowCreateListSerializer(serializers.ModelSerializer):
 class FavouriteShoplistRecipeSerializer(serializers.ModelSerializer):
     """Сериалайзер ответа на добавление рецепта в избранное или шоплист."""
 
-    image = serializers.SerializerMethodField()
+    image = Base64ImageField(rendition='thumbnail', read_only=True)
 
     class Meta:
         model = Recipe
         fields = ['id', 'name', 'image', 'cooking_time']
-
-    def get_image(self, obj):
-        request = self.context.get('request')
-        if obj.image:
-            return request.build_absolute_uri(obj.image.url)
-        return None
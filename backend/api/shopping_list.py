@@ -0,0 +1,232 @@
+import csv
+from io import BytesIO
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from api.metrics import CACHE_REQUESTS
+from foodgram_backend.constants import (
+    SHOPPING_LIST_CACHE_MAX_ROWS,
+    SHOPPING_LIST_CACHE_TIMEOUT
+)
+from foodgram_backend.replicas import use_primary
+from recipes.catalog import get_catalog_version
+from recipes.models import IngredientRecipe, Shoplist
+
+CHUNK_SIZE = 2000
+PDF_FONT_NAME = 'ShoppingListFont'
+VERSION_KEY = 'shopping_list:version:{user_id}'
+ROWS_KEY = 'shopping_list:rows:{user_id}:{version}:{catalog_version}'
+HITS_KEY = 'shopping_list:hits'
+MISSES_KEY = 'shopping_list:misses'
+
+
+def get_shopping_list(user):
+    """
+    Суммарное количество каждого ингредиента из рецептов шоплиста.
+    Группировка по ингредиенту и его единице измерения (Measurement),
+    сортировка по названию, чтобы файл был одинаковым при повторах.
+    """
+    return IngredientRecipe.objects.filter(
+        recipe__shoplist_recipes__user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit__t_name',
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit__t_name',
+    )
+
+
+def get_cached_shopping_list(user):
+    """
+    Список покупок из кэша. Ключ содержит версию шоплиста пользователя
+    и версию справочников, поэтому устаревшие данные не читаются,
+    а просто истекают по таймауту.
+
+    Кэшируются только списки до SHOPPING_LIST_CACHE_MAX_ROWS строк.
+    Большие списки каждый раз читаются из базы через iterator() частями
+    по CHUNK_SIZE, чтобы не держать их целиком в памяти и в кэше;
+    в кэше для них остается только пометка, что список большой.
+    """
+    version_key = VERSION_KEY.format(user_id=user.pk)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid4().hex, None)
+        version = cache.get(version_key)
+    rows_key = ROWS_KEY.format(
+        user_id=user.pk,
+        version=version,
+        catalog_version=get_catalog_version()
+    )
+    rows = cache.get(rows_key)
+    if rows is not None and rows is not False:
+        increment(HITS_KEY)
+        CACHE_REQUESTS.labels('shopping_list', 'hit').inc()
+        return rows
+    increment(MISSES_KEY)
+    CACHE_REQUESTS.labels('shopping_list', 'miss').inc()
+    if rows is False:
+        return get_shopping_list(user).iterator(chunk_size=CHUNK_SIZE)
+    # Лишняя строка показывает, что список больше порога. Строки
+    # кэшируются под текущей версией, поэтому читаем основную базу
+    with use_primary():
+        rows = list(
+            get_shopping_list(user)[:SHOPPING_LIST_CACHE_MAX_ROWS + 1]
+        )
+    if len(rows) > SHOPPING_LIST_CACHE_MAX_ROWS:
+        cache.set(rows_key, False, SHOPPING_LIST_CACHE_TIMEOUT)
+        return get_shopping_list(user).iterator(chunk_size=CHUNK_SIZE)
+    cache.set(rows_key, rows, SHOPPING_LIST_CACHE_TIMEOUT)
+    return rows
+
+
+def invalidate_shopping_lists(user_ids):
+    """
+    Меняет версию кэша списка покупок у переданных пользователей.
+    Версия меняется после коммита, чтобы параллельный запрос
+    не закэшировал под новой версией еще не закоммиченные данные.
+    """
+    versions = {
+        VERSION_KEY.format(user_id=user_id): uuid4().hex
+        for user_id in user_ids
+    }
+    if versions:
+        transaction.on_commit(lambda: cache.set_many(versions, None))
+
+
+def invalidate_recipe_shopping_lists(recipe_id):
+    """
+    Сбрасывает кэш у всех, у кого рецепт лежит в шоплисте.
+    Пользователи выбираются после коммита, один раз на рецепт
+    в транзакции, даже если изменилось много его ингредиентов.
+    """
+    connection = transaction.get_connection()
+    if any(
+        getattr(callback, 'recipe_id', None) == recipe_id
+        for _, callback in connection.run_on_commit
+    ):
+        return
+
+    def invalidate():
+        with use_primary():
+            user_ids = list(Shoplist.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('user_id', flat=True))
+        cache.set_many({
+            VERSION_KEY.format(user_id=user_id): uuid4().hex
+            for user_id in user_ids
+        }, None)
+
+    invalidate.recipe_id = recipe_id
+    transaction.on_commit(invalidate)
+
+
+def increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_cache_stats():
+    hits, misses = (cache.get(key, 0) for key in (HITS_KEY, MISSES_KEY))
+    return {'hits': hits, 'misses': misses}
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу отдает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class TxtExporter:
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def stream(self, rows):
+        yield 'Список покупок:\n'
+        for name, unit, amount in rows:
+            yield f'\n{name} - {amount}, {unit}'
+
+
+class CsvExporter:
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        # BOM, чтобы Excel открыл кириллицу в UTF-8
+        yield '\ufeff' + writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        )
+        for name, unit, amount in rows:
+            yield writer.writerow((name, amount, unit))
+
+
+class PdfExporter:
+    """
+    PDF собирается reportlab целиком, поэтому отдается частями
+    уже после формирования документа. Шрифт должен поддерживать
+    кириллицу, путь к нему задается SHOPPING_LIST_PDF_FONT.
+    """
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    font_size = 12
+    line_height = 7 * mm
+    margin = 20 * mm
+
+    def stream(self, rows):
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+            )
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        _, height = A4
+        y = self.new_page(pdf, height)
+        pdf.drawString(self.margin, y, 'Список покупок:')
+        y -= self.line_height
+        for name, unit, amount in rows:
+            if y < self.margin:
+                pdf.showPage()
+                y = self.new_page(pdf, height)
+            pdf.drawString(self.margin, y, f'{name} - {amount}, {unit}')
+            y -= self.line_height
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(64 * 1024), b'')
+
+    def new_page(self, pdf, height):
+        pdf.setFont(PDF_FONT_NAME, self.font_size)
+        return height - self.margin
+
+
+EXPORTERS = {
+    'txt': TxtExporter,
+    'csv': CsvExporter,
+    'pdf': PdfExporter,
+}
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """
+    Параметр format выбирает формат файла, а не рендерер DRF,
+    поэтому при согласовании он не учитывается.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
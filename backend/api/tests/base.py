@@ -0,0 +1,103 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favourite,
+    Ingredient,
+    IngredientRecipe,
+    Measurement,
+    Recipe,
+    Shoplist,
+    Tag
+)
+from users.models import Follow
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_png():
+    """Картинка рецепта в виде data URI, как ее присылает фронтенд."""
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeTestCase(TestCase):
+    """Пользователи, справочники и клиенты для тестов API рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@example.com', username='cook',
+            first_name='Повар', last_name='Первый', password='pass12345!'
+        )
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Второй', password='pass12345!'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tags = [
+            Tag.objects.create(name='Завтрак', slug='breakfast'),
+            Tag.objects.create(name='Обед', slug='lunch'),
+        ]
+        unit = Measurement.objects.create(t_name='г')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit=unit)
+            for number in range(120)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by('pk'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Версии и снимки живут в кэше и не откатываются вместе с базой
+        cache.clear()
+        # Копии изображений строятся в фоновом потоке и здесь не нужны
+        patcher = mock.patch('recipes.signals.schedule_renditions')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.anonymous = APIClient()
+
+    def create_recipes(self, count, author=None, ingredients=3):
+        """Рецепты с тегами и ингредиентами, часть - в избранном и шоплисте."""
+        author = author or self.author
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text='Описание', author=author,
+                image='recipes/images/test.png', cooking_time=10,
+            )
+            recipe.tags.set(self.tags)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in self.ingredients[:ingredients]
+            )
+            if number % 2:
+                Favourite.objects.create(user=self.user, recipe=recipe)
+            if number % 3:
+                Shoplist.objects.create(user=self.user, recipe=recipe)
+            recipes.append(recipe)
+        if author != self.user:
+            Follow.objects.get_or_create(follower=self.user, following=author)
+        return recipes
@@ -0,0 +1,64 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from foodgram_backend.cache import check_cache_sharing
+
+from recipes.management.commands.import_ingredients import DEFAULT_PATHS
+from recipes.models import Ingredient
+
+SHARED_CACHE = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+
+class SharedCacheCommandsTest(SimpleTestCase):
+    """Отчеты по счетчикам воркеров читают только общий кэш."""
+
+    def test_shopping_list_stats_requires_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, 'REDIS_URL'):
+            call_command('shopping_list_stats')
+
+    def test_shopping_list_stats_with_shared_cache(self):
+        self.assertIn('Попаданий: 0', self.call_with_shared_cache(
+            'shopping_list_stats'
+        ))
+
+    def test_profiling_report_requires_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, 'REDIS_URL'):
+            call_command('profiling_report')
+
+    def test_profiling_report_with_shared_cache(self):
+        self.assertIn('Статистики нет', self.call_with_shared_cache(
+            'profiling_report'
+        ))
+
+    def test_workers_warned_about_process_local_cache(self):
+        self.assertEqual(check_cache_sharing(1), [])
+        warning, = check_cache_sharing(4)
+        self.assertIn('REDIS_URL', warning)
+        with tempfile.TemporaryDirectory() as path, override_settings(
+            CACHES={'default': {**SHARED_CACHE, 'LOCATION': path}}
+        ):
+            self.assertEqual(check_cache_sharing(4), [])
+
+    def call_with_shared_cache(self, name):
+        with tempfile.TemporaryDirectory() as path, override_settings(
+            CACHES={'default': {**SHARED_CACHE, 'LOCATION': path}}
+        ):
+            out = StringIO()
+            call_command(name, stdout=out)
+        return out.getvalue()
+
+
+class ImportIngredientsTest(TestCase):
+    """Импорт ингредиентов без --path берет файл из data/ репозитория."""
+
+    def test_default_path_is_repository_csv(self):
+        self.assertTrue(DEFAULT_PATHS[0].exists())
+        call_command('import_ingredients', stdout=StringIO())
+        with DEFAULT_PATHS[0].open(encoding='utf-8') as file:
+            rows = sum(1 for line in file if line.strip())
+        self.assertEqual(Ingredient.objects.count(), rows)
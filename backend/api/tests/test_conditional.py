@@ -0,0 +1,65 @@
+from api.tests.base import RecipeTestCase
+
+
+class RecipeListETagTest(RecipeTestCase):
+
+    def get_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified_while_nothing_changes(self):
+        self.create_recipes(2)
+        etag = self.get_etag('/api/recipes/')
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_recipe_leaving_filter_changes_etag(self):
+        recipe, other = self.create_recipes(2, author=self.user)
+        url = f'/api/recipes/?tags={self.tags[0].slug}'
+        etag = self.get_etag(url)
+        # У оставшегося в выборке рецепта updated_at не меняется
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {'tags': [self.tags[1].pk]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [other.pk]
+        )
+
+    def test_unfavorite_changes_etag(self):
+        recipe = self.create_recipes(2)[1]
+        url = '/api/recipes/?is_favorited=1'
+        etag = self.get_etag(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_author_rename_changes_detail_etag(self):
+        recipe, = self.create_recipes(1)
+        url = f'/api/recipes/{recipe.pk}/'
+        etag = self.get_etag(url)
+        self.author.first_name = 'Переименованный'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['author']['first_name'], 'Переименованный'
+        )
+
+    def test_author_rename_changes_list_etag(self):
+        self.create_recipes(1)
+        etag = self.get_etag('/api/recipes/')
+        self.author.last_name = 'Переименованный'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
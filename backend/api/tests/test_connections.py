@@ -0,0 +1,56 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from foodgram_backend.db import (
+    check_connections_health,
+    mark_connections_released
+)
+
+
+class ConnectionHealthTest(SimpleTestCase):
+    """Постоянное соединение проверяется только после простоя."""
+
+    def setUp(self):
+        self.connection = mock.Mock(spec=[
+            'settings_dict', 'connection', 'is_usable', 'close'
+        ])
+        self.connection.settings_dict = {
+            'CONN_HEALTH_CHECKS': True, 'CONN_HEALTH_CHECK_IDLE': 30,
+        }
+        self.connection.is_usable.return_value = False
+        patcher = mock.patch(
+            'foodgram_backend.db.connections.all',
+            return_value=[self.connection]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_recently_used_connection_is_not_checked(self):
+        mark_connections_released()
+        check_connections_health()
+        self.connection.is_usable.assert_not_called()
+        self.connection.close.assert_not_called()
+
+    def test_idle_connection_is_checked_and_closed(self):
+        mark_connections_released()
+        self.connection.released_at -= 31
+        check_connections_health()
+        self.connection.is_usable.assert_called_once_with()
+        self.connection.close.assert_called_once_with()
+
+    def test_connection_without_requests_is_checked(self):
+        check_connections_health()
+        self.connection.is_usable.assert_called_once_with()
+
+    def test_closed_connection_is_not_marked(self):
+        self.connection.connection = None
+        mark_connections_released()
+        self.assertFalse(hasattr(self.connection, 'released_at'))
+
+    def test_checks_disabled(self):
+        self.connection.settings_dict['CONN_HEALTH_CHECKS'] = False
+        self.connection.released_at = time.monotonic() - 3600
+        check_connections_health()
+        self.connection.is_usable.assert_not_called()
@@ -0,0 +1,41 @@
+from api.tests.base import RecipeTestCase
+from recipes.models import Favourite, Recipe, Shoplist
+
+
+class CountersTest(RecipeTestCase):
+    """Счетчики ведут сигналы, какой бы путь записи ни использовался."""
+
+    def test_orm_relations_update_counters(self):
+        recipe, = self.create_recipes(1)
+        Favourite.objects.create(user=self.author, recipe=recipe)
+        Shoplist.objects.create(user=self.author, recipe=recipe)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourites_count, 1)
+        self.assertEqual(recipe.shoplist_count, 1)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+
+    def test_unfavorite_after_orm_create(self):
+        recipe, = self.create_recipes(1)
+        Favourite.objects.create(user=self.user, recipe=recipe)
+        response = self.client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourites_count, 0)
+
+    def test_decrement_does_not_go_below_zero(self):
+        recipe, = self.create_recipes(1)
+        Favourite.objects.create(user=self.user, recipe=recipe)
+        # Счетчик разошелся с таблицей, например после ручной правки
+        Recipe.objects.filter(pk=recipe.pk).update(favourites_count=0)
+        response = self.client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourites_count, 0)
+
+    def test_recipe_delete_updates_author(self):
+        recipe, = self.create_recipes(1, author=self.user)
+        response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recipes_count, 0)
@@ -0,0 +1,85 @@
+import random
+
+from api.tests.base import RecipeTestCase
+from recipes.matching import MatchingIndex
+from recipes.models import IngredientRecipe, Recipe
+
+
+class MatchingIndexTest(RecipeTestCase):
+    """Подбор по битовым множествам совпадает с перебором рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        self.random = random.Random(2024)
+        self.pool = self.ingredients[:12]
+        self.recipes = {}
+        for number in range(40):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text='Описание', author=self.author,
+                image='recipes/images/test.png', cooking_time=10,
+            )
+            ingredients = self.random.sample(
+                self.pool, self.random.randint(1, 7)
+            )
+            self.set_ingredients(recipe, ingredients)
+
+    def set_ingredients(self, recipe, ingredients):
+        IngredientRecipe.objects.filter(recipe=recipe).delete()
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        self.recipes[recipe.pk] = {ingredient.pk for ingredient in ingredients}
+
+    def brute_force(self, ingredient_ids, max_missing):
+        matches = [
+            (recipe_id, len(ingredients - ingredient_ids))
+            for recipe_id, ingredients in self.recipes.items()
+            if ingredients & ingredient_ids
+        ]
+        return sorted(
+            (
+                (recipe_id, missing) for recipe_id, missing in matches
+                if max_missing is None or missing <= max_missing
+            ),
+            key=lambda match: (match[1], -match[0])
+        )
+
+    def assert_matches_brute_force(self, index):
+        for _ in range(30):
+            ingredient_ids = {
+                ingredient.pk for ingredient in self.random.sample(
+                    self.pool, self.random.randint(1, 8)
+                )
+            }
+            max_missing = self.random.choice((None, 0, 1, 3))
+            expected = self.brute_force(ingredient_ids, max_missing)
+            result = index.match(ingredient_ids, max_missing)
+            with self.subTest(
+                ingredients=sorted(ingredient_ids), max_missing=max_missing
+            ):
+                self.assertEqual(len(result), len(expected))
+                self.assertEqual(result[0:len(result)], expected)
+                # Срез страницы из середины выдачи
+                self.assertEqual(result[5:17], expected[5:17])
+
+    def test_match_equals_brute_force(self):
+        self.assert_matches_brute_force(MatchingIndex())
+
+    def test_synced_index_equals_brute_force(self):
+        index = MatchingIndex()
+        changed = self.random.sample(sorted(self.recipes), 10)
+        for recipe in Recipe.objects.filter(pk__in=changed[:6]):
+            self.set_ingredients(recipe, self.random.sample(
+                self.pool, self.random.randint(1, 7)
+            ))
+            recipe.save()
+        Recipe.objects.filter(pk__in=changed[6:]).delete()
+        for recipe_id in changed[6:]:
+            del self.recipes[recipe_id]
+        index.sync(generation=1, deleted=1)
+        self.assert_matches_brute_force(index)
+
+    def test_unknown_ingredients_match_nothing(self):
+        result = MatchingIndex().match([self.ingredients[-1].pk])
+        self.assertEqual(len(result), 0)
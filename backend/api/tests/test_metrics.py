@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.backends.postgresql import base
+from django.test import SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+from psycopg2 import extensions
+
+from foodgram_backend.db_pool.base import DatabaseWrapper, _pools
+
+
+class MetricsAccessTest(SimpleTestCase):
+
+    url = '/metrics'
+
+    def test_allowed_from_localhost(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_requests_total', response.content)
+
+    def test_forbidden_from_other_address(self):
+        response = self.client.get(self.url, REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+    def test_allowed_from_network(self):
+        response = self.client.get(self.url, REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        for authorization, status in (
+            ('Bearer secret', 200),
+            ('Bearer wrong', 403),
+        ):
+            with self.subTest(authorization=authorization):
+                response = self.client.get(
+                    self.url, REMOTE_ADDR='10.0.0.5',
+                    HTTP_AUTHORIZATION=authorization
+                )
+                self.assertEqual(response.status_code, status)
+
+
+class ConnectionMetricsTest(SimpleTestCase):
+    """Открытые соединения считаются отдельно от выдач из пула."""
+
+    alias = 'pool_metrics'
+
+    def setUp(self):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'foodgram_backend.db_pool',
+            'NAME': 'foodgram',
+            'POOL_SIZE': 1,
+            'POOL_TIMEOUT': 1,
+        }, alias=self.alias)
+        self.addCleanup(_pools.pop, self.alias, None)
+        raw = mock.MagicMock(closed=False)
+        raw.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+        patcher = mock.patch.object(
+            base.DatabaseWrapper, 'get_new_connection', return_value=raw
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.wrapper = wrapper
+
+    def value(self, name):
+        return REGISTRY.get_sample_value(name, {'alias': self.alias}) or 0
+
+    def test_pool_checkouts_do_not_count_as_new_connections(self):
+        opened = self.value('foodgram_db_connections_opened_total')
+        checkouts = self.value('foodgram_db_pool_checkouts_total')
+        for _ in range(3):
+            self.wrapper.connect()
+            self.wrapper.close()
+        self.assertEqual(
+            self.value('foodgram_db_connections_opened_total'), opened + 1
+        )
+        self.assertEqual(
+            self.value('foodgram_db_pool_checkouts_total'), checkouts + 3
+        )
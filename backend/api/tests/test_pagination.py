@@ -0,0 +1,35 @@
+from api.tests.base import RecipeTestCase
+from recipes.models import Recipe
+from recipes.search import update_search_index
+
+
+class RecipePaginationTest(RecipeTestCase):
+
+    def test_cursor_pages_follow_creation_order(self):
+        recipes = self.create_recipes(5)
+        response = self.client.get('/api/recipes/?cursor=&limit=2')
+        self.assertNotIn('count', response.data)
+        ids = [item['id'] for item in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [item['id'] for item in response.data['results']]
+        self.assertEqual(ids, [recipe.pk for recipe in recipes[:-5:-1]])
+
+    def test_search_ignores_cursor_and_keeps_relevance(self):
+        by_name = Recipe.objects.create(
+            name='Борщ', text='Суп', author=self.author,
+            image='recipes/images/test.png', cooking_time=10,
+        )
+        by_text = Recipe.objects.create(
+            name='Суп', text='Почти борщ', author=self.author,
+            image='recipes/images/test.png', cooking_time=10,
+        )
+        update_search_index()
+        expected = [by_name.pk, by_text.pk]
+        for query in ('search=борщ', 'search=борщ&cursor='):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/recipes/?{query}')
+                self.assertEqual(response.data['count'], 2)
+                self.assertEqual(
+                    [item['id'] for item in response.data['results']],
+                    expected
+                )
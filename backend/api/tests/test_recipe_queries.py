@@ -0,0 +1,43 @@
+from api.tests.base import RecipeTestCase
+
+
+class RecipeReadQueriesTest(RecipeTestCase):
+    """Число запросов чтения не зависит от размера страницы и рецепта."""
+
+    LIST_QUERIES = 5
+    DETAIL_QUERIES = 5
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        self.create_recipes(12)
+        # Прогрев: справочники и связи пользователя попадают в кэш
+        self.client.get('/api/recipes/?limit=1')
+        for limit in (1, 6, 12):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    response = self.client.get(f'/api/recipes/?limit={limit}')
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_flags_come_without_extra_queries(self):
+        recipes = self.create_recipes(4)
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get('/api/recipes/')
+        flags = {
+            item['id']: (item['is_favorited'], item['is_in_shopping_cart'])
+            for item in response.data['results']
+        }
+        self.assertEqual(flags[recipes[1].pk], (True, True))
+        self.assertEqual(flags[recipes[0].pk], (False, False))
+        self.assertTrue(
+            response.data['results'][0]['author']['is_subscribed']
+        )
+
+    def test_detail_queries_do_not_grow_with_ingredients(self):
+        small, = self.create_recipes(1, ingredients=1)
+        large, = self.create_recipes(1, ingredients=40)
+        self.client.get(f'/api/recipes/{small.pk}/')
+        for recipe, count in ((small, 1), (large, 40)):
+            with self.subTest(ingredients=count):
+                with self.assertNumQueries(self.DETAIL_QUERIES):
+                    response = self.client.get(f'/api/recipes/{recipe.pk}/')
+                self.assertEqual(len(response.data['ingredients']), count)
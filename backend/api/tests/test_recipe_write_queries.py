@@ -0,0 +1,66 @@
+from api.tests.base import RecipeTestCase, make_png
+
+
+class RecipeWriteQueriesTest(RecipeTestCase):
+    """Число запросов записи не зависит от количества ингредиентов."""
+
+    CREATE_QUERIES = 12
+    UPDATE_QUERIES = 15
+
+    def payload(self, ingredients, amount=10):
+        return {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': make_png(),
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient in ingredients
+            ],
+        }
+
+    def setUp(self):
+        super().setUp()
+        # Прогрев: справочники и связи пользователя попадают в кэш
+        self.client.post(
+            '/api/recipes/', self.payload(self.ingredients[:1]), format='json'
+        )
+
+    def test_create_queries_do_not_grow_with_ingredients(self):
+        for count in (1, 50):
+            with self.subTest(ingredients=count):
+                with self.assertNumQueries(self.CREATE_QUERIES):
+                    response = self.client.post(
+                        '/api/recipes/',
+                        self.payload(self.ingredients[:count]),
+                        format='json'
+                    )
+                self.assertEqual(response.status_code, 201, response.data)
+                self.assertEqual(len(response.data['ingredients']), count)
+
+    def test_update_queries_do_not_grow_with_ingredients(self):
+        for count in (1, 50):
+            with self.subTest(ingredients=count):
+                response = self.client.post(
+                    '/api/recipes/',
+                    self.payload(self.ingredients[:count + 1]),
+                    format='json'
+                )
+                url = f'/api/recipes/{response.data["id"]}/'
+                # Первый ингредиент убран, один добавлен,
+                # у остальных изменилось количество
+                ingredients = self.ingredients[1:count + 2]
+                with self.assertNumQueries(self.UPDATE_QUERIES):
+                    response = self.client.patch(
+                        url, self.payload(ingredients, amount=20),
+                        format='json'
+                    )
+                self.assertEqual(response.status_code, 200, response.data)
+                self.assertEqual(
+                    {item['amount'] for item in response.data['ingredients']},
+                    {20}
+                )
+                self.assertEqual(
+                    len(response.data['ingredients']), count + 1
+                )
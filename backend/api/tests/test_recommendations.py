@@ -0,0 +1,105 @@
+import random
+
+from api.tests.base import RecipeTestCase, User
+from recipes.models import (
+    Favourite,
+    RecipeNeighbour,
+    Shoplist,
+    UserRecommendation
+)
+from recipes.recommendations import build_all, refresh
+
+
+class RecommendationsTest(RecipeTestCase):
+    """Частичный пересчет совпадает с полным для затронутых строк."""
+
+    def setUp(self):
+        super().setUp()
+        self.random = random.Random(7)
+        self.recipes = self.create_recipes(10)
+        self.users = [self.user, self.author] + [
+            User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name='Пользователь', last_name='', password='pass'
+            )
+            for number in range(6)
+        ]
+
+    def add_relations(self, users, count):
+        """Каждому пользователю - count рецептов, которых у него не было."""
+        for user in users:
+            own = set(
+                Favourite.objects.filter(user=user).values_list(
+                    'recipe_id', flat=True
+                )
+            ).union(Shoplist.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            ))
+            new = [recipe for recipe in self.recipes if recipe.pk not in own]
+            for recipe in self.random.sample(new, min(count, len(new))):
+                model = self.random.choice((Favourite, Shoplist))
+                model.objects.create(user=user, recipe=recipe)
+
+    def snapshot(self, recipe_ids, user_ids):
+        neighbours = {
+            (recipe_id, neighbour_id): (count, round(score, 9))
+            for recipe_id, neighbour_id, count, score in
+            RecipeNeighbour.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'neighbour_id', 'count', 'score')
+        }
+        feeds = {
+            (user_id, recipe_id): round(score, 9)
+            for user_id, recipe_id, score in
+            UserRecommendation.objects.filter(
+                user_id__in=user_ids
+            ).values_list('user_id', 'recipe_id', 'score')
+        }
+        return neighbours, feeds
+
+    def test_refresh_equals_full_rebuild(self):
+        self.add_relations(self.users, 4)
+        build_all()
+        # У self.user рецепты уже есть почти все, берем остальных
+        changed = self.users[1::3]
+        self.add_relations(changed, 3)
+        # Затронуты рецепты пользователей с новыми строками: у них
+        # поменялись счетчики пар
+        recipe_ids = {
+            recipe_id
+            for model in (Favourite, Shoplist)
+            for recipe_id in model.objects.filter(
+                user__in=changed
+            ).values_list('recipe_id', flat=True)
+        }
+        user_ids = {user.pk for user in changed}
+        refresh()
+        refreshed = self.snapshot(recipe_ids, user_ids)
+        build_all()
+        self.assertEqual(refreshed, self.snapshot(recipe_ids, user_ids))
+        self.assertTrue(refreshed[0])
+        self.assertTrue(refreshed[1])
+
+    def test_refresh_without_new_rows_changes_nothing(self):
+        self.add_relations(self.users, 4)
+        build_all()
+        self.assertEqual(refresh(), (0, 0))
+
+
+class SimilarRecipesTest(RecipeTestCase):
+
+    def test_similar_for_missing_recipe_is_not_found(self):
+        response = self.client.get('/api/recipes/999999/similar/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_similar_lists_neighbours(self):
+        recipe, neighbour = self.create_recipes(2)
+        RecipeNeighbour.objects.create(
+            recipe=recipe, neighbour=neighbour, count=1, score=1.0
+        )
+        response = self.client.get(f'/api/recipes/{recipe.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in response.data], [neighbour.pk]
+        )
@@ -0,0 +1,94 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from foodgram_backend.replicas import (
+    ReplicaMiddleware,
+    ReplicaRouter,
+    use_primary
+)
+from recipes.models import Recipe
+
+REPLICA = 'replica_1'
+
+
+@override_settings(DB_REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTest(SimpleTestCase):
+    """Чтение с реплики и возврат к основной базе."""
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.router.replicas = [REPLICA]
+        self.factory = RequestFactory()
+
+    def read_alias(self, method='get', token='token', read=None):
+        """База, из которой читается рецепт внутри запроса."""
+        read = read or (lambda: self.router.db_for_read(Recipe))
+        middleware = ReplicaMiddleware(lambda request: HttpResponse(read()))
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        response = middleware(getattr(self.factory, method)('/', **headers))
+        return response.content.decode()
+
+    def test_safe_request_reads_from_replica(self):
+        self.assertEqual(self.read_alias(), REPLICA)
+
+    def test_outside_request_reads_from_primary(self):
+        self.assertEqual(self.router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
+
+    def test_write_request_reads_from_primary(self):
+        self.assertEqual(self.read_alias('post'), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_write(Recipe), DEFAULT_DB_ALIAS)
+
+    def test_reads_stick_to_primary_after_write(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.read_alias('post')
+        self.assertEqual(cache_set.call_args[0][2], 10)
+        self.assertEqual(self.read_alias(), DEFAULT_DB_ALIAS)
+        # Другой клиент и аноним продолжают читать с реплики
+        self.assertEqual(self.read_alias(token='other'), REPLICA)
+        self.assertEqual(self.read_alias(token=None), REPLICA)
+
+    def test_reads_return_to_replica_after_sticky_window(self):
+        self.read_alias('post')
+        # Окно DB_REPLICA_STICKY_SECONDS истекло - ключ ушел из кэша
+        cache.clear()
+        self.assertEqual(self.read_alias(), REPLICA)
+
+    def test_use_primary_falls_back_inside_safe_request(self):
+        def read():
+            with use_primary():
+                return self.router.db_for_read(Recipe)
+
+        self.assertEqual(self.read_alias(read=read), DEFAULT_DB_ALIAS)
+
+    def test_tokens_are_read_from_primary(self):
+        def read():
+            return self.router.db_for_read(Token)
+
+        self.assertEqual(self.read_alias(read=read), DEFAULT_DB_ALIAS)
+
+    def test_background_thread_reads_from_primary(self):
+        def read():
+            aliases = []
+            thread = threading.Thread(
+                target=lambda: aliases.append(
+                    self.router.db_for_read(Recipe)
+                )
+            )
+            thread.start()
+            thread.join()
+            return aliases[0]
+
+        self.assertEqual(self.read_alias(read=read), DEFAULT_DB_ALIAS)
+
+    def test_migrations_run_on_primary_only(self):
+        self.assertTrue(
+            self.router.allow_migrate(DEFAULT_DB_ALIAS, 'recipes')
+        )
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'recipes'))
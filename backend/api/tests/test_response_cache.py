@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import response_cache
+from api.tests.base import RecipeTestCase
+from recipes.catalog import get_catalog_version
+from recipes.models import Recipe
+from recipes.versions import RECIPES_GENERATION_KEY, get_version
+
+
+class AnonymousResponseCacheTest(RecipeTestCase):
+    """Кэш ответов анонимам сбрасывается поколением рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe, = self.create_recipes(1, author=self.user)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def rename(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                self.url, {'name': name}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def lock_taken(self):
+        """Блокировку пересчета держит другой запрос."""
+        add = cache.add
+
+        def add_unless_lock(key, *args, **kwargs):
+            if key.endswith(':lock'):
+                return False
+            return add(key, *args, **kwargs)
+
+        return mock.patch.object(cache, 'add', side_effect=add_unless_lock)
+
+    def test_repeated_request_is_served_from_cache(self):
+        self.anonymous.get('/api/recipes/')
+        with self.assertNumQueries(0):
+            response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_recipe_change_invalidates_list_and_detail(self):
+        self.anonymous.get('/api/recipes/')
+        self.anonymous.get(self.url)
+        self.rename('Новое название')
+        response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(
+            response.json()['results'][0]['name'], 'Новое название'
+        )
+        response = self.anonymous.get(self.url)
+        self.assertEqual(response.json()['name'], 'Новое название')
+
+    def test_recipe_delete_invalidates_detail(self):
+        self.anonymous.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(pk=self.recipe.pk).delete()
+        self.assertEqual(self.anonymous.get(self.url).status_code, 404)
+
+    def test_stale_entry_is_served_while_rebuilding(self):
+        self.anonymous.get('/api/recipes/')
+        self.rename('Новое название')
+        with self.lock_taken(), self.assertNumQueries(0):
+            response = self.anonymous.get('/api/recipes/')
+        # Пересчет идет в другом запросе, этот отдает прежний ответ
+        self.assertEqual(response.json()['results'][0]['name'], 'Рецепт 0')
+
+    def test_request_without_entry_stops_waiting(self):
+        with self.lock_taken(), mock.patch.object(
+            response_cache, 'RECIPE_RESPONSE_WAIT_TIMEOUT', 0
+        ):
+            response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        # Ответ не дождавшегося запроса не кэшируется, это дело
+        # держателя блокировки
+        with CaptureQueriesContext(connection) as queries:
+            self.anonymous.get('/api/recipes/')
+        self.assertTrue(queries.captured_queries)
+
+    def test_waiting_request_takes_rebuilt_entry(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.anonymous.get('/api/recipes/')
+        (key, entry, _), _ = cache_set.call_args
+        self.rename('Новое название')
+        cache.delete(key)
+
+        def rebuild(seconds):
+            # Держатель блокировки сохранил ответ нового поколения
+            cache.set(key, (
+                (
+                    get_version(RECIPES_GENERATION_KEY),
+                    get_catalog_version()
+                ),
+                b'{"rebuilt": true}', entry[2]
+            ))
+
+        with self.lock_taken(), mock.patch.object(
+            response_cache.time, 'sleep', side_effect=rebuild
+        ), self.assertNumQueries(0):
+            response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(response.json(), {'rebuilt': True})
@@ -0,0 +1,50 @@
+from api.tests.base import RecipeTestCase, User
+from recipes.models import Recipe
+from recipes.search import search_recipes, update_search_index
+
+
+class RecipeSearchTest(RecipeTestCase):
+    """Поиск отбирает рецепты и сортирует их по релевантности."""
+
+    def setUp(self):
+        super().setUp()
+        # Более релевантный рецепт старше: порядок по дате обратный
+        self.by_name = self.create_recipe('Борщ', 'Суп')
+        self.by_text = self.create_recipe('Суп', 'Почти борщ')
+        self.create_recipe('Каша', 'Овсяная')
+        update_search_index()
+
+    def create_recipe(self, name, text):
+        return Recipe.objects.create(
+            name=name, text=text, author=self.author,
+            image='recipes/images/test.png', cooking_time=10,
+        )
+
+    def test_name_match_ranks_above_text_match(self):
+        recipes = list(search_recipes(Recipe.objects.all(), 'борщ'))
+        self.assertEqual(recipes, [self.by_name, self.by_text])
+        self.assertGreater(recipes[0].search_rank, recipes[1].search_rank)
+
+    def test_admin_search_keeps_relevance(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Админ', last_name='', password='pass12345!'
+        )
+        self.client.force_login(admin)
+        url = '/admin/recipes/recipe/'
+        response = self.client.get(url, {'q': 'борщ'})
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [self.by_name, self.by_text]
+        )
+        # Сортировка по колонке важнее релевантности
+        response = self.client.get(url, {'q': 'борщ', 'o': '-1'})
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [self.by_text, self.by_name]
+        )
+        # С фильтром по тегу аннотации нет, сортировка по умолчанию
+        response = self.client.get(url, {
+            'q': 'борщ', 'tags__id__exact': self.tags[0].pk
+        })
+        self.assertEqual(response.status_code, 200)
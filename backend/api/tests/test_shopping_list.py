@@ -0,0 +1,65 @@
+from unittest import mock
+
+from api.tests.base import RecipeTestCase
+from recipes.models import Favourite
+from users.models import Follow
+
+
+class ShoppingListCacheTest(RecipeTestCase):
+    """Маленькие списки покупок кэшируются, большие читаются из базы."""
+
+    url = '/api/recipes/download_shopping_cart/'
+
+    def download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_small_list_is_served_from_cache(self):
+        self.create_recipes(3, ingredients=2)
+        content = self.download()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.download(), content)
+
+    def test_large_list_is_streamed_from_database(self):
+        self.create_recipes(3, ingredients=5)
+        with mock.patch('api.shopping_list.SHOPPING_LIST_CACHE_MAX_ROWS', 2):
+            content = self.download()
+            # Токен и сам список, без повторной проверки размера
+            with self.assertNumQueries(2):
+                self.assertEqual(self.download(), content)
+        self.assertEqual(content.count('\n'), 6)
+
+    def test_ingredient_edit_outside_api_invalidates_cache(self):
+        recipe = self.create_recipes(2, ingredients=1)[1]
+        content = self.download()
+        # Как при правке инлайна в админке
+        with self.captureOnCommitCallbacks(execute=True):
+            row = recipe.ingredient_recipes.get()
+            row.amount = 500
+            row.save()
+        self.assertNotEqual(self.download(), content)
+        self.assertIn(' - 500,', self.download())
+
+    def test_recipe_delete_outside_api_invalidates_cache(self):
+        recipe = self.create_recipes(2, ingredients=1)[1]
+        self.assertIn('ингредиент 0', self.download())
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertNotIn('ингредиент 0', self.download())
+
+
+class UserRelationsCacheTest(RecipeTestCase):
+
+    def test_relations_outside_api_invalidate_flags(self):
+        recipe, = self.create_recipes(1)
+        url = f'/api/recipes/{recipe.pk}/'
+        self.assertFalse(self.client.get(url).data['is_favorited'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Favourite.objects.create(user=self.user, recipe=recipe)
+        self.assertTrue(self.client.get(url).data['is_favorited'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(follower=self.user).delete()
+        self.assertFalse(
+            self.client.get(url).data['author']['is_subscribed']
+        )
@@ -0,0 +1,19 @@
+from api.tests.base import RecipeTestCase
+
+
+class SubscriptionsTest(RecipeTestCase):
+
+    url = '/api/users/subscriptions/'
+
+    def test_empty_subscriptions_with_recipes_limit(self):
+        response = self.client.get(f'{self.url}?recipes_limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(response.data['results'], [])
+
+    def test_recipes_limit_per_author(self):
+        self.create_recipes(4)
+        response = self.client.get(f'{self.url}?recipes_limit=3')
+        self.assertEqual(response.status_code, 200)
+        author, = response.data['results']
+        self.assertEqual(len(author['recipes']), 3)
@@ -0,0 +1,79 @@
+from io import BytesIO
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import LimitedJSONParser, RequestTooLarge
+from api.tests.base import RecipeTestCase, make_png
+from recipes.models import Recipe
+
+
+class RecipeImageLimitsTest(RecipeTestCase):
+    """Изображение проверяется по размеру и числу пикселей."""
+
+    def post_recipe(self):
+        return self.client.post('/api/recipes/', {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': make_png(),
+            'tags': [self.tags[0].pk],
+            'ingredients': [{'id': self.ingredients[0].pk, 'amount': 10}],
+        }, format='json')
+
+    def test_image_within_limits_is_accepted(self):
+        with override_settings(RECIPE_IMAGE_MAX_PIXELS=64):
+            response = self.post_recipe()
+        self.assertEqual(response.status_code, 201, response.data)
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=10)
+    def test_image_over_size_limit_is_rejected(self):
+        response = self.post_recipe()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['image'][0].code, 'too_large')
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=63)
+    def test_image_over_pixel_limit_is_rejected(self):
+        response = self.post_recipe()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['image'][0].code, 'too_many_pixels')
+
+    @override_settings(API_REQUEST_MAX_SIZE=100)
+    def test_oversized_body_is_rejected(self):
+        response = self.post_recipe()
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Recipe.objects.exists())
+
+
+@override_settings(API_REQUEST_MAX_SIZE=100)
+class LimitedJSONParserTest(SimpleTestCase):
+    """Размер тела проверяется до разбора JSON."""
+
+    def parse(self, body, content_length):
+        request = APIRequestFactory().post(
+            '/', body, content_type='application/json'
+        )
+        request.META['CONTENT_LENGTH'] = str(content_length)
+        stream = mock.Mock(wraps=BytesIO(body))
+        try:
+            return LimitedJSONParser().parse(
+                stream, parser_context={'request': request}
+            )
+        finally:
+            self.stream = stream
+
+    def test_small_body_is_parsed(self):
+        self.assertEqual(self.parse(b'{"a": 1}', 8), {'a': 1})
+
+    def test_declared_length_is_checked_before_reading(self):
+        with self.assertRaises(RequestTooLarge):
+            self.parse(b'{}', 101)
+        self.stream.read.assert_not_called()
+
+    def test_understated_length_is_caught_while_reading(self):
+        body = b'{"a": "%s"}' % (b'x' * 200)
+        with self.assertRaises(RequestTooLarge):
+            self.parse(body, 10)
+        self.stream.read.assert_called_once_with(101)
@@ -6,7 +6,8 @@ from .views import (
     RecipeViewSet,
     IngredientViewSet,
     TagViewSet,
-    FollowViewSet
+    FollowViewSet,
+    ProfilingViewSet
 )
 
 app_name = 'api'
@@ -18,6 +19,7 @@ v1_router.register(r'recipes', RecipeViewSet, basename='recipes')
 v1_router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 v1_router.register(r'tags', TagViewSet, basename='tags')
 v1_router.register(r'follow', FollowViewSet, basename='following')
+v1_router.register(r'profiling', ProfilingViewSet, basename='profiling')
 
 
 urlpatterns = [
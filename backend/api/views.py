@@ -1,46 +1,73 @@
+import time
+
 from rest_framework import (
     viewsets,
-    filters,
     status
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.http import Http404, StreamingHttpResponse
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from djoser.views import UserViewSet as DjoserUserViewSet
 
-from api.filters import (
-    RecipeFilter,
-    IngredientFilter
+from api.conditional import ConditionalGetMixin
+from api.filters import RecipeFilter
+from api.metrics import RELATION_WRITES, observe_stream
+from api.pagination import (
+    CustomPagination,
+    RecipePagination,
+    TimelinePagination
 )
-from api.pagination import CustomPagination
 from api.permissions import IsRecipeAuthorOrReadOnly
+from api.profiling import get_report, reset
+from api.response_cache import AnonymousResponseCacheMixin
+from api.shopping_list import (
+    EXPORTERS,
+    ShoppingListNegotiation,
+    get_cached_shopping_list
+)
 from .serializers import (
     UserSerializer,
     FollowSerializer,
     FollowCreateListSerializer,
     RecipeSerializer,
     RecipeGetSerializer,
+    RecipeMatchSerializer,
     IngredientSerializer,
     TagSerializer,
     CurrentUserSerializer,
-    FavouriteShoplistRecipeSerializer
+    FavouriteShoplistRecipeSerializer,
+    get_author_recipes,
+    get_recipe_prefetches,
+    get_recipes_limit
+)
+from foodgram_backend.constants import (
+    RECOMMENDATION_FEED_SIZE,
+    RECOMMENDATION_NEIGHBOURS
 )
+from recipes.catalog import get_catalog, get_catalog_version
+from recipes.matching import get_matching_index
 from recipes.models import (
-    Tag,
-    Ingredient,
     Recipe,
     Favourite,
     Shoplist
 )
+from recipes.versions import (
+    RECIPES_GENERATION_KEY,
+    get_user_profile_version,
+    get_version,
+    version_to_datetime
+)
 from users.models import (
     Follow,
 )
@@ -75,12 +102,21 @@ class UserViewSet(DjoserUserViewSet):
     )
     def subscriptions(self, request):
         # Получаем список всех пользователей, на которых подписан текущий
-        subscriptions = User.objects.filter(followers__follower=request.user)
+        subscriptions = User.objects.filter(
+            followers__follower=request.user
+        ).order_by('id')
         # Применяем кастомную пагинацию
         paginator = CustomPagination()
         result_page = paginator.paginate_queryset(subscriptions, request)
+        # Рецепты всех авторов страницы одним запросом
+        author_recipes = get_author_recipes(
+            [author.pk for author in result_page],
+            get_recipes_limit(request)
+        )
         serializer = FollowCreateListSerializer(
-            result_page, many=True, context={'request': request}
+            result_page,
+            many=True,
+            context={'request': request, 'author_recipes': author_recipes}
         )
         return paginator.get_paginated_response(serializer.data)
 
@@ -113,6 +149,7 @@ class UserViewSet(DjoserUserViewSet):
             follower=user,
             following=user_to_subscribe
         )
+        RELATION_WRITES.labels('follow', 'add').inc()
         # перенаправляем на сериалайзер, чтобы получить ответ как в ReDoc
         serializer = FollowCreateListSerializer(
             user_to_subscribe, context={'request': request}
@@ -138,6 +175,7 @@ class UserViewSet(DjoserUserViewSet):
             )
         # Удаляем запись подписки
         follow_inst.delete()
+        RELATION_WRITES.labels('follow', 'remove').inc()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -153,7 +191,11 @@ class FollowViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,
+    AnonymousResponseCacheMixin,
+    viewsets.ModelViewSet
+):
     """
     Вьюсет для создания и редактирования
     рецепта с готовыми ингредиентами +
@@ -161,11 +203,57 @@ class RecipeViewSet(viewsets.ModelViewSet):
     """
 
     permission_classes = [IsAuthenticatedOrReadOnly, IsRecipeAuthorOrReadOnly]
-    queryset = Recipe.objects.all()
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     filterset_class = RecipeFilter
     filter_backends = (DjangoFilterBackend,)
 
+    def get_queryset(self):
+        # Один план запроса на страницу: автор через JOIN, теги и
+        # ингредиенты предзагружаются. Флаги пользователя сериалайзер
+        # берет из api.relations, а не запросом на каждый рецепт.
+        return Recipe.objects.select_related('author').prefetch_related(
+            *get_recipe_prefetches()
+        )
+
+    def get_conditional_validators(self):
+        user_part, user_changed = self.get_user_validators()
+        catalog_version = get_catalog_version()
+        if self.action == 'list':
+            # Рецепт может выйти из выборки фильтра, не меняя максимум
+            # updated_at оставшихся, поэтому берем поколение всех
+            # рецептов: его меняет любое сохранение или удаление.
+            # Избранное и шоплист учитывает версия пользователя.
+            generation = get_version(RECIPES_GENERATION_KEY)
+            parts = (generation, catalog_version, user_part)
+            dates = (version_to_datetime(generation),)
+        else:
+            try:
+                pk = int(self.kwargs['pk'])
+            except ValueError:
+                return None
+            row = Recipe.objects.filter(pk=pk).values_list(
+                'updated_at', 'author_id'
+            ).first()
+            if row is None:
+                return None
+            updated_at, author_id = row
+            # Имя автора в ответе меняется без изменения рецепта
+            author_version = get_user_profile_version(author_id)
+            parts = (updated_at, author_version, catalog_version, user_part)
+            dates = (updated_at, version_to_datetime(author_version))
+        dates += (version_to_datetime(catalog_version), user_changed)
+        return parts, max(date for date in dates if date is not None)
+
+    def get_serializer_context(self):
+        # В списках отдаем копии изображений для карточек
+        context = super().get_serializer_context()
+        context['image_rendition'] = (
+            'card'
+            if self.action in ('list', 'feed', 'by_ingredients')
+            else 'full'
+        )
+        return context
+
     def get_serializer_class(self):
         # перекидываем все гет запросы на сериалайзер RecipeGetSerializer
         if self.action == 'list':
@@ -175,6 +263,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        # Счетчик автора и кэши шоплистов обновляют сигналы удаления
+        instance.delete()
+
     def pre_favorite_shoplist_post(
             self,
             request,
@@ -198,7 +290,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'message': f'Рецепт уже добавлен в {favor_shplst}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        favor_shplst.objects.create(user=user, recipe=recipe)
+        # Счетчик рецепта увеличивает сигнал post_save в той же транзакции
+        with transaction.atomic():
+            favor_shplst.objects.create(user=user, recipe=recipe)
+        RELATION_WRITES.labels(favor_shplst._meta.model_name, 'add').inc()
         serializer = FavouriteShoplistRecipeSerializer(
             recipe,
             context={'request': request},
@@ -213,19 +308,24 @@ class RecipeViewSet(viewsets.ModelViewSet):
     ):
         user = self.request.user
         recipe = get_object_or_404(Recipe, id=kwargs['pk'])
-        try:
-            favor_shplst.objects.get(
+        with transaction.atomic():
+            deleted, _ = favor_shplst.objects.filter(
                 user=user, recipe=recipe
             ).delete()
-            return Response(
-                {'detail': f'Рецепт удален из {favor_shplst}.'},
-                status=status.HTTP_204_NO_CONTENT
-            )
-        except favor_shplst.DoesNotExist:
-            return Response(
-                {'detail': f'Рецепт не был ранее добавлен в {favor_shplst}.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            if not deleted:
+                return Response(
+                    {'detail': (
+                        f'Рецепт не был ранее добавлен в {favor_shplst}.'
+                    )},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        RELATION_WRITES.labels(
+            favor_shplst._meta.model_name, 'remove'
+        ).inc()
+        return Response(
+            {'detail': f'Рецепт удален из {favor_shplst}.'},
+            status=status.HTTP_204_NO_CONTENT
+        )
 
     @action(
         detail=True,
@@ -272,46 +372,206 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=False,
         methods=['get'],
-        url_path='download_shopping_cart',
+        url_path='feed',
         permission_classes=[IsAuthenticated]
     )
-    def download_shopping_cart(self, request):
-        # Получаем ингредиенты для рецептов в списке покупок текущего юзера
-        user_shoplist = Shoplist.objects.filter(
-            user=request.user
-        ).values_list(
-            'recipe__ingredient_recipes__ingredient__name',
-            'recipe__ingredient_recipes__ingredient__measurement_unit__t_name',
-        ).annotate(
-            total_amount=Sum('recipe__ingredient_recipes__amount')
+    def feed(self, request):
+        # Общая лента последних рецептов всех авторов из подписок
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author__in=Follow.objects.filter(
+                follower=request.user
+            ).values('following')
+        )
+        paginator = TimelinePagination()
+        page = paginator.paginate_queryset(queryset, request, self)
+        serializer = RecipeGetSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='by_ingredients'
+    )
+    def by_ingredients(self, request):
+        # Рецепты по имеющимся ингредиентам: сначала те, что можно
+        # приготовить целиком, затем без одного и т.д.
+        ingredient_ids = get_ingredient_ids(request)
+        max_missing = get_max_missing(request)
+        matches = get_matching_index().match(ingredient_ids, max_missing)
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(matches, request, self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page]
+        )
+        results = []
+        for recipe_id, missing in page:
+            # Рецепт могли удалить после синхронизации индекса
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.missing_ingredients = missing
+                results.append(recipe)
+        serializer = RecipeMatchSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='similar'
+    )
+    def similar(self, request, pk):
+        # Соседи посчитаны заранее (build_recommendations),
+        # здесь одна выборка по индексу (recipe, -score)
+        recipe = get_object_or_404(Recipe.objects.only('pk'), id=pk)
+        recipes = Recipe.objects.filter(
+            neighbour_of__recipe=recipe
+        ).order_by('-neighbour_of__score')[:RECOMMENDATION_NEIGHBOURS]
+        serializer = FavouriteShoplistRecipeSerializer(
+            recipes, many=True, context={'request': request}
         )
+        return Response(serializer.data)
 
-        # Формируем текст списка покупок
-        shopping_list = ['Список покупок:\n']
-        for ingredient in user_shoplist:
-            name = ingredient[0]
-            unit = ingredient[1]
-            amount = ingredient[2]
-            shopping_list.append(f'\n{name} - {amount}, {unit}')
-
-        # Создаем HTTP-ответ с содержимым списка покупок
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename="shoplst.txt"'
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='recommended',
+        permission_classes=[IsAuthenticated]
+    )
+    def recommended(self, request):
+        recipes = Recipe.objects.filter(
+            recommended_to__user=request.user
+        ).order_by('-recommended_to__score')[:RECOMMENDATION_FEED_SIZE]
+        serializer = FavouriteShoplistRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='download_shopping_cart',
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=ShoppingListNegotiation
+    )
+    def download_shopping_cart(self, request):
+        # Формат файла: txt (по умолчанию), csv или pdf
+        file_format = request.query_params.get('format', 'txt').lower()
+        if file_format not in EXPORTERS:
+            return Response(
+                {'format': f'Доступные форматы: {", ".join(EXPORTERS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        exporter = EXPORTERS[file_format]()
+        started = time.perf_counter()
+        # Строки агрегируются в базе и кэшируются до изменения шоплиста
+        rows = get_cached_shopping_list(request.user)
+        response = StreamingHttpResponse(
+            observe_stream(exporter.stream(rows), file_format, started),
+            content_type=exporter.content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shoplst.{exporter.extension}"'
+        )
         return response
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    """Вьюсет списка ингредиентов для эндпоина ингредиентов."""
+def get_ingredient_ids(request):
+    """id ингредиентов из ?ingredients=1&ingredients=2 или ?ingredients=1,2."""
+    try:
+        ingredient_ids = {
+            int(value)
+            for values in request.query_params.getlist('ingredients')
+            for value in values.split(',') if value.strip()
+        }
+    except ValueError:
+        raise ValidationError({'ingredients': 'Ожидаются id ингредиентов.'})
+    if not ingredient_ids:
+        raise ValidationError({'ingredients': 'Укажите ингредиенты.'})
+    return ingredient_ids
+
+
+def get_max_missing(request):
+    """Необязательное ограничение числа недостающих ингредиентов."""
+    value = request.query_params.get('max_missing')
+    if value is None:
+        return None
+    try:
+        max_missing = int(value)
+    except ValueError:
+        max_missing = -1
+    if max_missing < 0:
+        raise ValidationError(
+            {'max_missing': 'Ожидается неотрицательное число.'}
+        )
+    return max_missing
+
+
+def get_catalog_object(rows, pk):
+    """Строка справочника по id из URL или 404."""
+    try:
+        return rows[int(pk)]
+    except (KeyError, ValueError):
+        raise Http404
+
+
+class CatalogConditionalGetMixin(ConditionalGetMixin):
+    """Ответы справочников меняются только вместе с версией кэша."""
+
+    def get_conditional_validators(self):
+        version = get_catalog_version()
+        return (version,), version_to_datetime(version)
+
+
+class IngredientViewSet(
+    CatalogConditionalGetMixin,
+    viewsets.ReadOnlyModelViewSet
+):
+    """
+    Вьюсет списка ингредиентов для эндпоина ингредиентов.
+    Ответы строятся из кэша справочников без запросов к базе.
+    """
 
     serializer_class = IngredientSerializer
-    queryset = Ingredient.objects.all()
-    filterset_class = IngredientFilter
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
-    filterset_fields = ('name',)
-    search_fields = ('name',)
+
+    def get_queryset(self):
+        catalog = get_catalog()
+        name = self.request.query_params.get('name')
+        if name:
+            return catalog.search_ingredients(name)
+        return list(catalog.ingredients.values())
+
+    def get_object(self):
+        ingredient = get_catalog_object(
+            get_catalog().ingredients, self.kwargs['pk']
+        )
+        self.check_object_permissions(self.request, ingredient)
+        return ingredient
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет списка тегов для эндпоина тегов."""
     serializer_class = TagSerializer
-    queryset = Tag.objects.all()
+
+    def get_queryset(self):
+        return list(get_catalog().tags.values())
+
+    def get_object(self):
+        tag = get_catalog_object(get_catalog().tags, self.kwargs['pk'])
+        self.check_object_permissions(self.request, tag)
+        return tag
+
+
+class ProfilingViewSet(viewsets.ViewSet):
+    """Отчет профилирования запросов по эндпоинтам, только для админов."""
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        return Response(get_report())
+
+    @action(detail=False, methods=['delete'])
+    def reset(self, request):
+        reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
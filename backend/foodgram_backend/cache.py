@@ -0,0 +1,23 @@
+"""Проверки настроек кэша Django."""
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_process_local(alias=DEFAULT_CACHE_ALIAS):
+    """Кэш живет в памяти процесса, другие процессы его не видят."""
+    return isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def check_cache_sharing(workers):
+    """
+    Предупреждение для нескольких воркеров с кэшем в памяти процесса:
+    метки версий, снимки и счетчики у каждого воркера будут свои.
+    """
+    if workers > 1 and is_process_local():
+        return [
+            f'Воркеров {workers}, а кэш Django в памяти процесса: метки '
+            'версий и счетчики у них не общие, ответы могут устаревать. '
+            'Задайте REDIS_URL.'
+        ]
+    return []
@@ -5,3 +5,18 @@ NAME_LONG_NUMBCHAR = 256
 NAME_MID_NUMBCHAR = 200
 NAME_SHORT_NUMBCHAR = 128
 COLOR_NUMBCHAR = 16
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_SUBSTRING_MIN_LENGTH = 3
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+SHOPPING_LIST_CACHE_MAX_ROWS = 1000
+USER_RELATIONS_CACHE_TIMEOUT = 60 * 60 * 24
+RECIPE_RESPONSE_CACHE_TIMEOUT = 60 * 10
+RECIPE_RESPONSE_LOCK_TIMEOUT = 10
+RECIPE_RESPONSE_WAIT_TIMEOUT = 2
+MATCHING_SYNC_OVERLAP = 60 * 5
+RECOMMENDATION_NEIGHBOURS = 20
+RECOMMENDATION_FEED_SIZE = 50
+RECOMMENDATION_MAX_USER_ITEMS = 500
+PROFILING_SAMPLES = 1000
+PROFILING_FLUSH_INTERVAL = 10
+PROFILING_CACHE_TIMEOUT = 60 * 60 * 24
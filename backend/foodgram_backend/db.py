@@ -0,0 +1,81 @@
+"""
+Постоянные соединения с базой: проверка перед запросом и запас
+соединений на сервере.
+
+CONN_HEALTH_CHECKS появился только в Django 4.1, поэтому в начале
+каждого запроса переиспользуемое соединение проверяем сами
+(SELECT 1) и закрываем, если сервер его уже оборвал. Иначе после
+перезапуска PostgreSQL первый запрос каждого потока получил бы ошибку.
+Как и в пуле, проверяется только соединение, простаивавшее дольше
+CONN_HEALTH_CHECK_IDLE секунд: под нагрузкой лишний SELECT 1 на каждый
+запрос удваивал бы число обращений к серверу.
+"""
+import time
+
+from django.db import connections
+from django.dispatch import Signal
+
+# Пул открыл новое соединение с сервером. connection_created
+# у пула срабатывает на каждую выдачу соединения из него
+pool_connection_opened = Signal()
+
+
+def check_connections_health(**kwargs):
+    """Обработчик request_started."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if (
+            connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and connection.connection is not None
+            and now - getattr(connection, 'released_at', 0)
+            > connection.settings_dict.get('CONN_HEALTH_CHECK_IDLE', 0)
+            and not connection.is_usable()
+        ):
+            connection.close()
+
+
+def mark_connections_released(**kwargs):
+    """Обработчик request_finished: с этого момента соединение простаивает."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.released_at = now
+
+
+def get_connections_per_worker(settings_dict, threads):
+    """Сколько соединений может держать один воркер."""
+    return settings_dict.get('POOL_SIZE') or threads
+
+
+def check_connection_budget(workers, threads=1):
+    """
+    Предупреждения, если соединений всех воркеров больше, чем
+    max_connections сервера (без резерва суперпользователя).
+    """
+    warnings = []
+    for connection in connections.all():
+        if connection.vendor != 'postgresql':
+            continue
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SHOW max_connections')
+                max_connections = int(cursor.fetchone()[0])
+                cursor.execute('SHOW superuser_reserved_connections')
+                max_connections -= int(cursor.fetchone()[0])
+        finally:
+            # Проверка идет в мастере gunicorn: воркеры не должны
+            # унаследовать ни открытое соединение, ни соединение в пуле
+            connection.close()
+            if hasattr(connection, 'get_pool'):
+                connection.get_pool().clear()
+        per_worker = get_connections_per_worker(
+            connection.settings_dict, threads
+        )
+        if per_worker > max_connections / workers:
+            warnings.append(
+                f'База {connection.alias}: воркеров {workers} по '
+                f'{per_worker} соединений, а сервер принимает '
+                f'{max_connections} ({max_connections // workers} '
+                f'на воркер). Уменьшите DB_POOL_SIZE или число воркеров.'
+            )
+    return warnings
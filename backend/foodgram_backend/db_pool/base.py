@@ -0,0 +1,120 @@
+"""
+Бэкенд PostgreSQL с пулом соединений в процессе (DB_POOL_SIZE > 0).
+
+Django 3.2 не поддерживает psycopg 3 и его пул, поэтому пул свой:
+соединение psycopg2 после запроса не закрывается, а возвращается
+в пул и достается следующему потоку. Открытых соединений в процессе
+не больше POOL_SIZE, лишние потоки ждут свободное до POOL_TIMEOUT
+секунд. CONN_MAX_AGE при этом должен быть 0, чтобы Django отдавал
+соединение в пул в конце каждого запроса.
+
+При CONN_HEALTH_CHECKS соединение перед выдачей проверяется SELECT 1,
+но только если пролежало в пуле дольше CONN_HEALTH_CHECK_IDLE секунд:
+недавно вернувшееся соединение почти наверняка живо, а лишний запрос
+на каждую выдачу удваивал бы число обращений к серверу.
+"""
+import queue
+import threading
+import time
+
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from foodgram_backend.db import pool_connection_opened
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+
+    def __init__(self, size, timeout, health_checks, health_check_idle=0):
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self.health_check_idle = health_check_idle
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def get(self, connect):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError('Нет свободных соединений в пуле.')
+        try:
+            while True:
+                try:
+                    connection, returned = self.idle.get_nowait()
+                except queue.Empty:
+                    return connect()
+                if self.is_usable(connection, time.monotonic() - returned):
+                    return connection
+                connection.close()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def put(self, connection):
+        try:
+            if connection.closed:
+                return
+            status = connection.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                # Соединение с сервером потеряно
+                connection.close()
+                return
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            self.idle.put((connection, time.monotonic()))
+        except Exception:
+            connection.close()
+        finally:
+            self.slots.release()
+
+    def clear(self):
+        """Закрывает свободные соединения."""
+        while True:
+            try:
+                self.idle.get_nowait()[0].close()
+            except queue.Empty:
+                return
+
+    def is_usable(self, connection, idle_for=0):
+        if connection.closed:
+            return False
+        if not self.health_checks or idle_for <= self.health_check_idle:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self):
+        pool = _pools.get(self.alias)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(self.alias)
+                if pool is None:
+                    pool = _pools[self.alias] = ConnectionPool(
+                        self.settings_dict['POOL_SIZE'],
+                        self.settings_dict.get('POOL_TIMEOUT', 10),
+                        self.settings_dict.get('CONN_HEALTH_CHECKS', False),
+                        self.settings_dict.get('CONN_HEALTH_CHECK_IDLE', 0),
+                    )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        return self.get_pool().get(lambda: self.open_connection(conn_params))
+
+    def open_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pool_connection_opened.send(sender=self.__class__, connection=self)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().put(self.connection)
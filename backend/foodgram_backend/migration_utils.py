@@ -0,0 +1,16 @@
+"""Общие части миграций."""
+
+
+def run_for_vendor(postgresql, sqlite):
+    """
+    Функция для RunPython, выполняющая SQL своей базы: кортежи
+    postgresql и sqlite, на остальных базах ничего не делает.
+    """
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgresql,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, ())
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
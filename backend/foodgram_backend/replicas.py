@@ -0,0 +1,100 @@
+"""
+Чтение с реплик базы (DB_REPLICAS).
+
+Реплики используются только внутри GET/HEAD/OPTIONS запросов к сайту:
+команды, фоновые потоки и запросы на запись работают с основной базой.
+После записи клиент (по заголовку Authorization) еще
+DB_REPLICA_STICKY_SECONDS читает из основной базы, чтобы сразу видеть
+свои изменения, пока реплика догоняет.
+
+Токены всегда читаются из основной базы: только что выданный токен
+мог еще не дойти до реплики. Данные, которые кладутся в кэш под новой
+версией (справочники, ответы анонимам), тоже строятся по основной
+базе через use_primary, иначе отставшая реплика закэшировалась бы
+до следующего изменения.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_KEY = 'db:primary:{digest}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_MODELS = {'authtoken.token'}
+
+_state = threading.local()
+
+
+@contextmanager
+def use_primary():
+    """Чтение из основной базы внутри блока."""
+    _state.primary = getattr(_state, 'primary', 0) + 1
+    try:
+        yield
+    finally:
+        _state.primary -= 1
+
+
+class ReplicaRouter:
+
+    def __init__(self):
+        self.replicas = [
+            alias for alias in settings.DATABASES
+            if alias != DEFAULT_DB_ALIAS
+        ]
+
+    def db_for_read(self, model, **hints):
+        if (
+            not getattr(_state, 'replica', False)
+            or getattr(_state, 'primary', 0)
+            or model._meta.label_lower in PRIMARY_MODELS
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Во всех базах одни и те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему репликацией
+        return db == DEFAULT_DB_ALIAS
+
+
+def get_client_digest(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return md5(authorization.encode()).hexdigest()
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик для безопасных запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        digest = get_client_digest(request)
+        safe = request.method in SAFE_METHODS
+        _state.replica = safe and not (
+            digest and cache.get(STICKY_KEY.format(digest=digest))
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.replica = False
+        if not safe and digest:
+            cache.set(
+                STICKY_KEY.format(digest=digest),
+                True,
+                settings.DB_REPLICA_STICKY_SECONDS
+            )
+        return response
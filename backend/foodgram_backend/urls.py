@@ -3,10 +3,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api.metrics import metrics
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    # Наружу через nginx не проксируется, доступно внутри сети docker
+    path('metrics', metrics, name='metrics'),
 ]
 if settings.DEBUG:
     urlpatterns += static(
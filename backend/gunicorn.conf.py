@@ -0,0 +1,46 @@
+"""
+Настройки gunicorn, читаются автоматически из рабочего каталога.
+Очищают каталог метрик Prometheus (PROMETHEUS_MULTIPROC_DIR)
+и при старте проверяют запас соединений с базой и общий кэш.
+"""
+import os
+import shutil
+
+
+def on_starting(server):
+    # Счетчики прошлого запуска не должны попасть в новые значения
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def when_ready(server):
+    # Django настраивается в мастере только ради проверки, соединения
+    # закрываются до запуска воркеров
+    import django
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings'
+    )
+    django.setup()
+    from foodgram_backend.cache import check_cache_sharing
+    from foodgram_backend.db import check_connection_budget
+    for warning in check_cache_sharing(server.cfg.workers):
+        server.log.warning(warning)
+    try:
+        warnings = check_connection_budget(
+            server.cfg.workers, server.cfg.threads
+        )
+    except Exception as error:
+        server.log.warning(
+            'Не удалось проверить соединения с базой: %s', error
+        )
+        return
+    for warning in warnings:
+        server.log.warning(warning)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
 from django.contrib.auth.models import Group
 
 from .models import (
@@ -11,6 +11,7 @@ from .models import (
     Favourite,
     Shoplist
 )
+from .search import search_recipes
 
 admin.site.unregister(Group)
 
@@ -20,6 +21,23 @@ class IngredientRecipeInline(admin.TabularInline):
     extra = 1
 
 
+class RecipeChangeList(ChangeList):
+    """
+    Результаты поиска идут по релевантности, а не по Meta.ordering.
+    Явная сортировка по колонке важнее.
+    """
+
+    def get_ordering(self, request, queryset):
+        # Фильтр по тегам пересобирает запрос через Exists,
+        # и аннотации search_rank в нем уже нет
+        if (
+            ORDER_VAR not in self.params
+            and 'search_rank' in queryset.query.annotations
+        ):
+            return ['-search_rank', '-created_at', '-pk']
+        return super().get_ordering(request, queryset)
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     inlines = [IngredientRecipeInline]
@@ -31,18 +49,18 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('tags', 'author', 'name',)
     search_fields = ('name',)
 
-    def total_favorites(self, obj):
-        return obj.favourite_recipes_count
+    def get_search_results(self, request, queryset, search_term):
+        # Тот же полнотекстовый поиск, что и в API
+        return search_recipes(queryset, search_term), False
+
+    def get_changelist(self, request, **kwargs):
+        return RecipeChangeList
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(
-            favourite_recipes_count=Count('favourite_recipes')
-        )
-        return queryset
+    def total_favorites(self, obj):
+        return obj.favourites_count
 
     total_favorites.short_description = 'В избранном'
-    total_favorites.admin_order_field = 'favourite_recipes_count'
+    total_favorites.admin_order_field = 'favourites_count'
 
 
 @admin.register(Tag)
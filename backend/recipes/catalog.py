@@ -0,0 +1,114 @@
+"""
+Кэш справочников (теги, единицы измерения, ингредиенты) в памяти процесса.
+
+Справочники меняются только из админки и командами импорта, поэтому
+каждый воркер один раз загружает неизменяемый снимок и дальше отвечает
+из памяти. Актуальность снимка проверяется по версии в кэше Django:
+сохранение справочника через админку или импорт меняет версию,
+и при следующем обращении воркер перечитывает данные из базы.
+Для нескольких воркеров кэш Django должен быть общим (Redis и т.п.).
+"""
+import threading
+from bisect import bisect_left
+from types import MappingProxyType
+
+from foodgram_backend.constants import (
+    INGREDIENT_SEARCH_LIMIT,
+    INGREDIENT_SUBSTRING_MIN_LENGTH
+)
+from foodgram_backend.replicas import use_primary
+from .models import Tag, Measurement, Ingredient
+from .versions import bump_version, get_version
+
+CATALOG_VERSION_KEY = 'recipes:catalog:version'
+
+_lock = threading.Lock()
+_catalog = None
+
+
+class Catalog:
+    """Неизменяемый снимок справочников."""
+
+    def __init__(self, version):
+        self.version = version
+        self.tags = MappingProxyType(
+            {tag.pk: tag for tag in Tag.objects.order_by('pk')}
+        )
+        self.measurements = MappingProxyType(
+            {unit.pk: unit for unit in Measurement.objects.order_by('pk')}
+        )
+        ingredients = Ingredient.objects.order_by('pk')
+        for ingredient in ingredients:
+            # Единица измерения берется из уже загруженного справочника
+            ingredient.measurement_unit = self.measurements[
+                ingredient.measurement_unit_id
+            ]
+        self.ingredients = MappingProxyType(
+            {ingredient.pk: ingredient for ingredient in ingredients}
+        )
+        # Отсортированные пары (имя в нижнем регистре, id) для поиска
+        # по префиксу бинарным поиском
+        self.names = tuple(sorted(
+            (ingredient.name.lower(), ingredient.pk)
+            for ingredient in ingredients
+        ))
+
+    def search_ingredients(self, value):
+        """
+        Автодополнение ингредиентов: сначала совпадения по началу
+        названия, затем вхождения в середине, короткие названия выше.
+        """
+        value = value.strip().lower()
+        if not value:
+            return list(self.ingredients.values())
+        prefix_ids = set()
+        position = bisect_left(self.names, (value,))
+        while (
+            position < len(self.names)
+            and self.names[position][0].startswith(value)
+        ):
+            prefix_ids.add(self.names[position][1])
+            position += 1
+        substring_ids = set()
+        if len(value) >= INGREDIENT_SUBSTRING_MIN_LENGTH:
+            substring_ids = {
+                pk for name, pk in self.names
+                if value in name and pk not in prefix_ids
+            }
+
+        def by_length(pk):
+            name = self.ingredients[pk].name
+            return len(name), name
+
+        ranked = (
+            sorted(prefix_ids, key=by_length)
+            + sorted(substring_ids, key=by_length)
+        )
+        return [
+            self.ingredients[pk]
+            for pk in ranked[:INGREDIENT_SEARCH_LIMIT]
+        ]
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog():
+    """Возвращает актуальный снимок, при смене версии перечитывает его."""
+    global _catalog
+    version = get_catalog_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    with _lock:
+        if _catalog is None or _catalog.version != version:
+            # Снимок живет до следующей версии, реплика могла отстать
+            with use_primary():
+                _catalog = Catalog(version)
+        return _catalog
+
+
+def invalidate_catalog():
+    """Меняет версию справочников для всех воркеров."""
+    bump_version(CATALOG_VERSION_KEY)
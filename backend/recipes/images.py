@@ -0,0 +1,137 @@
+"""
+Уменьшенные копии изображений рецептов.
+
+Запрос сохраняет только оригинал, копии всех размеров строятся после
+коммита в пуле потоков процесса, без внешнего брокера. Пути копий
+хранятся в Recipe.image_renditions вместе с именем оригинала,
+по которому они построены; пока копий нет, отдается оригинал.
+Копии, не построенные из-за перезапуска воркера, достраивает
+команда render_images.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+from .versions import RECIPES_GENERATION_KEY, bump_version
+
+logger = logging.getLogger(__name__)
+
+# Размеры вписываются в рамку с сохранением пропорций
+RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+SOURCE = 'source'
+QUALITY = 82
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_output_format():
+    """WebP, если Pillow собран с libwebp, иначе JPEG."""
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def needs_renditions(recipe):
+    return (
+        bool(recipe.image)
+        and recipe.image_renditions.get(SOURCE) != recipe.image.name
+    )
+
+
+def build_renditions(recipe):
+    """Сохраняет копии всех размеров, в имени файла хеш содержимого."""
+    image_format, extension = get_output_format()
+    with recipe.image.open('rb') as file:
+        source = Image.open(file)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+    has_alpha = image_format == 'WEBP' and 'A' in source.getbands()
+    source = source.convert('RGBA' if has_alpha else 'RGB')
+    storage = recipe.image.storage
+    renditions = {SOURCE: recipe.image.name}
+    for name, size in RENDITIONS.items():
+        copy = source.copy()
+        copy.thumbnail(size, Image.LANCZOS)
+        buffer = BytesIO()
+        copy.save(buffer, image_format, quality=QUALITY)
+        content = buffer.getvalue()
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        path = f'recipes/renditions/{recipe.pk}/{name}-{digest}.{extension}'
+        if not storage.exists(path):
+            storage.save(path, ContentFile(content))
+        renditions[name] = path
+    return renditions
+
+
+def render_recipe_images(recipe_id, force=False):
+    """Строит копии изображения рецепта, True - если они обновились."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_renditions'
+    ).first()
+    if recipe is None or not (force and recipe.image or (
+        needs_renditions(recipe)
+    )):
+        return False
+    renditions = build_renditions(recipe)
+    # Пока строились копии, изображение могли заменить
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_renditions=renditions, updated_at=timezone.now())
+    if not updated:
+        return False
+    # Ответы с прежними ссылками устарели
+    bump_version(RECIPES_GENERATION_KEY)
+    stale = set(recipe.image_renditions.values()) - set(renditions.values())
+    stale.discard(recipe.image_renditions.get(SOURCE))
+    for path in stale:
+        recipe.image.storage.delete(path)
+    return True
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+        return _executor
+
+
+def run_in_background(recipe_id):
+    try:
+        render_recipe_images(recipe_id)
+    except Exception:
+        logger.exception('Не удалось построить копии рецепта %s', recipe_id)
+    finally:
+        # Соединения потока пула не закрываются Django сами
+        connections.close_all()
+
+
+def schedule_renditions(recipe):
+    """Ставит построение копий в очередь после коммита."""
+    if not needs_renditions(recipe):
+        return
+    recipe_id = recipe.pk
+    if not settings.RECIPE_IMAGE_WORKERS:
+        # Без пула (тесты, отладка) строим сразу после коммита
+        transaction.on_commit(lambda: render_recipe_images(recipe_id))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_in_background, recipe_id)
+    )
@@ -0,0 +1,293 @@
+import json
+import random
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.profiling import percentile
+from recipes.management.commands.seed_benchmark_data import USERNAME_PREFIX
+from recipes.models import Favourite, IngredientRecipe, Recipe, Shoplist
+
+User = get_user_model()
+
+PERCENTILES = (50, 95, 99)
+# Рост p95 меньше этого значения (мс) считаем шумом
+MIN_REGRESSION_MS = 5
+# (эндпоинт, вес в смеси); добавление в избранное и шоплист
+# сразу отменяется, чтобы данные между запусками не менялись
+MIX = (
+    ('recipes_list_anonymous', 15),
+    ('recipes_list', 15),
+    ('recipes_favorited', 5),
+    ('recipe_detail', 15),
+    ('subscriptions', 8),
+    ('feed', 5),
+    ('download_shopping_cart', 5),
+    ('favorite', 5),
+    ('shopping_cart', 3),
+    ('by_ingredients', 3),
+    ('search', 5),
+    ('ingredients', 4),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер API на данных seed_benchmark_data: смесь типичных '
+        'запросов через тестовый клиент, p50/p95/p99 и число SQL '
+        'по эндпоинтам, сравнение с сохраненным базовым замером'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--warmup', type=int, default=100,
+            help='Запросов до начала замера (кэши, индексы).'
+        )
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Сколько пользователей bench_* отправляют запросы.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--save-baseline', metavar='PATH',
+            help='Сохранить результаты как базовый замер.'
+        )
+        parser.add_argument(
+            '--compare', metavar='PATH',
+            help='Сравнить с базовым замером, при регрессии код выхода 1.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Допустимый рост p95, доля от базового значения.'
+        )
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['seed'])
+        self.prepare(options['users'])
+        self.client = Client()
+        names = [name for name, _ in MIX]
+        weights = [weight for _, weight in MIX]
+        plan = self.rnd.choices(
+            names, weights=weights, k=options['warmup'] + options['requests']
+        )
+        samples = defaultdict(list)
+        # Тестовый клиент обращается к хосту testserver
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            for number, name in enumerate(plan):
+                for endpoint, sample in getattr(self, f'run_{name}')():
+                    if number >= options['warmup']:
+                        samples[endpoint].append(sample)
+        results = self.summarize(samples)
+        self.print_results(results)
+        meta = {
+            'requests': options['requests'],
+            'seed': options['seed'],
+            'recipes': Recipe.objects.count(),
+            'favourites': Favourite.objects.count(),
+        }
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(json.dumps(
+                {'meta': meta, 'endpoints': results},
+                ensure_ascii=False, indent=2
+            ))
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовый замер сохранен в {options["save_baseline"]}.'
+            ))
+        if options['compare']:
+            self.compare(
+                json.loads(Path(options['compare']).read_text()),
+                meta, results, options['tolerance']
+            )
+
+    def prepare(self, users_count):
+        users = list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk')[:users_count])
+        if not users:
+            raise CommandError('Нет данных, сначала seed_benchmark_data.')
+        self.users = [
+            (user.pk, Token.objects.get_or_create(user=user)[0].key)
+            for user in users
+        ]
+        # Выборка через seed, чтобы запуски повторяли одни и те же запросы
+        recipe_ids = list(Recipe.objects.filter(
+            author__username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+        self.recipe_ids = self.rnd.sample(
+            recipe_ids, min(1000, len(recipe_ids))
+        )
+        # Ингредиенты из настоящих рецептов, чтобы подбор что-то находил
+        self.ingredient_ids = sorted(set(IngredientRecipe.objects.filter(
+            recipe_id__in=self.recipe_ids[:100]
+        ).values_list('ingredient_id', flat=True)))
+
+    def request(self, method, url, token=None):
+        """Один запрос: (время в мс, число SQL)."""
+        headers = {}
+        if token:
+            headers['HTTP_AUTHORIZATION'] = f'Token {token}'
+        started = time.perf_counter()
+        # Запросы к репликам считаются вместе с основной базой
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connection))
+                for connection in connections.all()
+            ]
+            response = self.client.generic(method, url, **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 500:
+            raise CommandError(f'{method} {url}: {response.status_code}')
+        return elapsed, sum(len(queries) for queries in captured)
+
+    def page(self):
+        return self.rnd.randint(1, 20)
+
+    def token(self):
+        return self.rnd.choice(self.users)[1]
+
+    def run_recipes_list_anonymous(self):
+        yield 'recipes_list_anonymous', self.request(
+            'GET', f'/api/recipes/?page={self.page()}'
+        )
+
+    def run_recipes_list(self):
+        yield 'recipes_list', self.request(
+            'GET', f'/api/recipes/?page={self.page()}', self.token()
+        )
+
+    def run_recipes_favorited(self):
+        yield 'recipes_favorited', self.request(
+            'GET', '/api/recipes/?is_favorited=1', self.token()
+        )
+
+    def run_recipe_detail(self):
+        recipe_id = self.rnd.choice(self.recipe_ids)
+        yield 'recipe_detail', self.request(
+            'GET', f'/api/recipes/{recipe_id}/', self.token()
+        )
+
+    def run_subscriptions(self):
+        yield 'subscriptions', self.request(
+            'GET', '/api/users/subscriptions/?recipes_limit=3', self.token()
+        )
+
+    def run_feed(self):
+        yield 'feed', self.request('GET', '/api/recipes/feed/', self.token())
+
+    def run_download_shopping_cart(self):
+        yield 'download_shopping_cart', self.request(
+            'GET', '/api/recipes/download_shopping_cart/', self.token()
+        )
+
+    def run_favorite(self):
+        yield from self.add_and_remove('favorite', Favourite)
+
+    def run_shopping_cart(self):
+        yield from self.add_and_remove('shopping_cart', Shoplist)
+
+    def add_and_remove(self, action, model):
+        user_id, token = self.rnd.choice(self.users)
+        # Берем рецепт, которого у пользователя еще нет, чтобы
+        # замерять успешное добавление и не удалить исходные данные
+        while True:
+            recipe_id = self.rnd.choice(self.recipe_ids)
+            if not model.objects.filter(
+                user_id=user_id, recipe_id=recipe_id
+            ).exists():
+                break
+        url = f'/api/recipes/{recipe_id}/{action}/'
+        yield action, self.request('POST', url, token)
+        yield f'delete_{action}', self.request('DELETE', url, token)
+
+    def run_by_ingredients(self):
+        ingredient_ids = self.rnd.sample(
+            self.ingredient_ids, min(8, len(self.ingredient_ids))
+        )
+        yield 'by_ingredients', self.request(
+            'GET',
+            '/api/recipes/by_ingredients/?ingredients='
+            + ','.join(map(str, ingredient_ids))
+        )
+
+    def run_search(self):
+        query = urlencode({'search': f'рецепт {self.rnd.randint(1, 999)}'})
+        yield 'search', self.request('GET', f'/api/recipes/?{query}')
+
+    def run_ingredients(self):
+        query = urlencode({'name': self.rnd.choice('абвгдкмпс')})
+        yield 'ingredients', self.request('GET', f'/api/ingredients/?{query}')
+
+    def summarize(self, samples):
+        results = {}
+        for endpoint, values in sorted(samples.items()):
+            timings = sorted(elapsed for elapsed, _ in values)
+            queries = sorted(count for _, count in values)
+            results[endpoint] = {
+                'requests': len(values),
+                **{
+                    f'p{percent}': percentile(timings, percent)
+                    for percent in PERCENTILES
+                },
+                'queries_p50': percentile(queries, 50),
+                'queries_max': queries[-1],
+            }
+        return results
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"эндпоинт":<26}{"запросов":>9}{"p50 мс":>9}{"p95 мс":>9}'
+            f'{"p99 мс":>9}{"SQL p50":>9}{"SQL max":>9}'
+        )
+        for endpoint, result in results.items():
+            self.stdout.write(
+                f'{endpoint:<26}{result["requests"]:>9}'
+                f'{result["p50"]:>9.2f}{result["p95"]:>9.2f}'
+                f'{result["p99"]:>9.2f}{result["queries_p50"]:>9}'
+                f'{result["queries_max"]:>9}'
+            )
+
+    def compare(self, baseline, meta, results, tolerance):
+        if baseline['meta'] != meta:
+            self.stdout.write(self.style.WARNING(
+                f'Параметры замера отличаются от базовых: '
+                f'{baseline["meta"]} -> {meta}'
+            ))
+        regressions = []
+        for endpoint, base in baseline['endpoints'].items():
+            result = results.get(endpoint)
+            if result is None:
+                continue
+            if (
+                result['p95'] > base['p95'] * (1 + tolerance)
+                and result['p95'] - base['p95'] > MIN_REGRESSION_MS
+            ):
+                regressions.append(
+                    f'{endpoint}: p95 {base["p95"]} -> {result["p95"]} мс'
+                )
+            # Число запросов не зависит от нагрузки, любой рост - регрессия
+            if result['queries_max'] > base['queries_max']:
+                regressions.append(
+                    f'{endpoint}: SQL {base["queries_max"]} -> '
+                    f'{result["queries_max"]}'
+                )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базового замера:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий не найдено.'))
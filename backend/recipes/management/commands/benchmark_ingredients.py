@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.catalog import get_catalog
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер автодополнения ингредиентов на загруженном каталоге: '
+        'кэш справочников и прежний поиск в базе без лимита'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', type=int, default=300,
+            help='Количество случайных поисковых строк.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError(
+                'Каталог пуст, сначала выполните import_ingredients.'
+            )
+        rnd = random.Random(options['seed'])
+        # Префиксы длиной 1-4 символа и подстроки из середины названий,
+        # как их набирает пользователь в форме рецепта.
+        terms = []
+        while len(terms) < options['queries']:
+            name = rnd.choice(names)
+            length = rnd.randint(1, 4)
+            start = 0 if rnd.random() < 0.7 else rnd.randint(
+                0, max(len(name) - length, 0)
+            )
+            term = name[start:start + length].strip()
+            if term:
+                terms.append(term)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиентов в каталоге: {len(names)}, '
+            f'запросов: {len(terms)}'
+        ))
+        queryset = Ingredient.objects.select_related('measurement_unit')
+        catalog = get_catalog()
+        modes = (
+            ('catalog', catalog.search_ingredients),
+            ('istartswith', lambda term: queryset.filter(
+                name__istartswith=term
+            )),
+            ('icontains', lambda term: queryset.filter(
+                name__icontains=term
+            )),
+        )
+        for mode, search in modes:
+            timings = []
+            rows = 0
+            for term in terms:
+                started = time.perf_counter()
+                rows += len(list(search(term)))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f'{mode:>12}: '
+                f'p50 {statistics.median(timings):.2f} мс, '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} мс, '
+                f'строк в ответе в среднем {rows / len(terms):.1f}'
+            )
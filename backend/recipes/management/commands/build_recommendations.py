@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.recommendations import build_all, refresh
+
+
+class Command(BaseCommand):
+    help = 'Пересчет похожих рецептов и персональных рекомендаций'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все, а не только новые добавления.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Пересчет рекомендаций...'))
+        started = time.monotonic()
+        recipes, users = build_all() if options['full'] else refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {recipes}, пользователей: {users} '
+            f'за {time.monotonic() - started:.1f} с.'
+        ))
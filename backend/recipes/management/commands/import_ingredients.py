@@ -1,45 +1,114 @@
+import csv
 import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from foodgram_backend import settings
+from recipes.catalog import invalidate_catalog
 from recipes.models import Measurement, Ingredient
 
 
+def read_json(file):
+    # json.load читает файл целиком, построчно читается только CSV
+    for item in json.load(file):
+        yield item['name'], item['measurement_unit']
+
+
+def read_csv(file):
+    # Строки вида "название,единица" без заголовка
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+READERS = {
+    '.json': read_json,
+    '.csv': read_csv,
+}
+
+# Файл по умолчанию лежит в data/ корня репозитория. В образ backend
+# корень не попадает, там берем копию из backend/data/
+DEFAULT_PATHS = (
+    settings.BASE_DIR.parent / 'data' / 'ingredients.csv',
+    settings.BASE_DIR / 'data' / 'ingredients.json',
+)
+
+
 class Command(BaseCommand):
-    help = 'Импортирование даты JSON в модель Джанго'
+    help = 'Импортирование ингредиентов из JSON или CSV в модель Джанго'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            help='Файл ингредиентов .json или .csv. По умолчанию '
+                 'data/ingredients.csv в корне репозитория.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько ингредиентов вставлять одним запросом.'
+        )
 
     def handle(self, *args, **options):
-        data_path = settings.BASE_DIR
-
-        self.stdout.write(self.style.SUCCESS('Импортирование данных v.4...'))
-
-        with open(
-            f'{data_path}/data/ingredients.json', 'r', encoding='utf-8'
-        ) as file:
-            data = json.load(file)
-
-            for item in data:
-                # Проверяем, существует ли ингредиент с таким именем в базе
-                existing_ingredient = Ingredient.objects.filter(
-                    name=item['name']
-                ).first()
-                if existing_ingredient:
-                    # Если ингредиент с таким именем уже существует,
-                    # выводим сообщение и пропускаем его
-                    self.stdout.write(self.style.WARNING(
-                        f'Ингредиент "{item["name"]}" уже в базе. Пропускаем.'
-                    ))
-                    continue
-
-                # Получаем или создаем экземпляр модели Measurement
-                measurement_inst, created = Measurement.objects.get_or_create(
-                    t_name=item['measurement_unit']
+        if options['path']:
+            path = Path(options['path'])
+        else:
+            path = next(
+                (path for path in DEFAULT_PATHS if path.exists()),
+                DEFAULT_PATHS[0]
+            )
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .json и .csv')
+
+        self.stdout.write(self.style.SUCCESS('Импортирование данных v.5...'))
+        started = time.monotonic()
+
+        total = 0
+        with open(path, 'r', encoding='utf-8') as file, \
+                transaction.atomic():
+            before = Ingredient.objects.count()
+            units = dict(Measurement.objects.values_list('t_name', 'pk'))
+            rows = (
+                (name.strip(), unit.strip()) for name, unit in reader(file)
+            )
+            # Строки обрабатываются пачками по batch_size, в памяти
+            # одновременно только одна пачка
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                total += len(batch)
+                self.add_units(units, {unit for _, unit in batch})
+                # Уникальность (name, measurement_unit) обеспечивает база:
+                # повторы в файле и повторный запуск ничего не дублируют
+                Ingredient.objects.bulk_create(
+                    (
+                        Ingredient(name=name, measurement_unit_id=units[unit])
+                        for name, unit in batch
+                    ),
+                    ignore_conflicts=True,
                 )
-                item['measurement_unit'] = measurement_inst
-                # Создаем экземпляр модели Ingredient и сохраняем его
-                ingredient_instance = Ingredient(**item)
-                ingredient_instance.save()
+            created = Ingredient.objects.count() - before
+            # bulk_create не отправляет сигналы, сбрасываем кэш сами
+            invalidate_catalog()
 
-        self.stdout.write(
-            self.style.SUCCESS('Импортирование данных завершено.')
-        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортирование данных завершено. Строк: {total}, '
+            f'добавлено: {created}, пропущено: {total - created}, '
+            f'{total / elapsed:.0f} строк/с.'
+        ))
+
+    def add_units(self, units, names):
+        """Создает недостающие единицы измерения одним запросом."""
+        missing = names - units.keys()
+        if missing:
+            Measurement.objects.bulk_create(
+                Measurement(t_name=name) for name in sorted(missing)
+            )
+            units.update(Measurement.objects.filter(
+                t_name__in=missing
+            ).values_list('t_name', 'pk'))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import get_report, reset
+from foodgram_backend.cache import is_process_local
+
+
+class Command(BaseCommand):
+    help = (
+        'Отчет профилирования запросов API по эндпоинтам: '
+        'время, число и время SQL, сериализация, размер ответа. '
+        'Статистику копят воркеры в кэше Django, поэтому нужен общий кэш '
+        '(REDIS_URL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Очистить собранную статистику после отчета.'
+        )
+        parser.add_argument(
+            '--duplicates', type=int, default=3,
+            help='Сколько повторяющихся форм SQL показывать.'
+        )
+
+    def handle(self, *args, **options):
+        if is_process_local():
+            raise CommandError(
+                'Кэш в памяти процесса: статистика воркеров отсюда не видна. '
+                'Задайте REDIS_URL.'
+            )
+        report = get_report(duplicates_limit=options['duplicates'])
+        if not report:
+            self.stdout.write(
+                'Статистики нет. Профилирование включается '
+                'переменной PROFILING_ENABLED.'
+            )
+        for endpoint, stats in report.items():
+            self.stdout.write(self.style.SUCCESS(
+                f'{endpoint}: запросов {stats["requests"]}'
+            ))
+            for metric, values in stats['metrics'].items():
+                self.stdout.write('  {:<16} {}'.format(metric, '  '.join(
+                    f'{name}={value}' for name, value in values.items()
+                )))
+            for duplicate in stats['duplicate_queries']:
+                self.stdout.write(self.style.WARNING(
+                    f'  повтор SQL в {duplicate["requests"]} запросах, '
+                    f'до {duplicate["max_repeats"]} раз: '
+                    f'{duplicate["sql"][:200]}'
+                ))
+        if options['reset']:
+            reset()
+            self.stdout.write(self.style.SUCCESS('Статистика очищена.'))
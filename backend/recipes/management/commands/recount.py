@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe, Favourite, Shoplist
+
+User = get_user_model()
+
+
+def count_of(model, field):
+    """Подзапрос количества строк model, ссылающихся на текущую запись."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков избранного, шоплистов и рецептов автора'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Пересчет счетчиков...'))
+
+        recipes = Recipe.objects.update(
+            favourites_count=count_of(Favourite, 'recipe'),
+            shoplist_count=count_of(Shoplist, 'recipe'),
+        )
+        users = User.objects.update(
+            recipes_count=count_of(Recipe, 'author')
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}.'
+        ))
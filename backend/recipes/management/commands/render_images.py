@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import render_recipe_images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Построение уменьшенных копий изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить копии у всех рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Построение копий...'))
+        rendered = 0
+        recipe_ids = Recipe.objects.exclude(image='').values_list(
+            'pk', flat=True
+        )
+        for recipe_id in recipe_ids.iterator():
+            rendered += render_recipe_images(recipe_id, options['force'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Копии построены для рецептов: {rendered}.'
+        ))
@@ -0,0 +1,220 @@
+import random
+import time
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import (
+    Favourite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    Shoplist,
+    Tag
+)
+from recipes.versions import RECIPES_GENERATION_KEY, bump_version
+from users.models import Follow
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'benchmark'
+IMAGE = 'recipes/images/benchmark.png'
+# Популярность авторов и рецептов убывает по закону Ципфа
+ZIPF_EXPONENT = 0.8
+
+
+def zipf_weights(size):
+    """Накопленные веса для random.choices: первые элементы популярнее."""
+    return list(accumulate(1 / (rank + 1) ** ZIPF_EXPONENT
+                           for rank in range(size)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Синтетические данные для нагрузочных замеров: пользователи, '
+        'подписки, рецепты с ингредиентами, избранное и шоплисты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Подписок на пользователя в среднем.'
+        )
+        parser.add_argument(
+            '--favourites', type=int, default=100,
+            help='Рецептов в избранном у пользователя в среднем.'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Рецептов в шоплисте у пользователя в среднем.'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=9,
+            help='Ингредиентов в рецепте в среднем.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить данные прошлого запуска (пользователи bench_*).'
+        )
+
+    def handle(self, *args, **options):
+        bench_users = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        )
+        if options['clear']:
+            deleted, _ = bench_users.delete()
+            self.stdout.write(f'Удалено записей: {deleted}.')
+        elif bench_users.exists():
+            raise CommandError(
+                'Данные уже сгенерированы, для пересоздания добавьте --clear.'
+            )
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError(
+                'Сначала загрузите справочники: import_ingredients '
+                'и import_tags.'
+            )
+        self.rnd = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(user_ids, options['recipes'])
+            self.report('Ингредиенты рецептов', self.insert(
+                IngredientRecipe,
+                self.recipe_ingredients(
+                    recipe_ids, ingredient_ids, options['ingredients']
+                )
+            ))
+            self.report('Теги рецептов', self.insert(
+                Recipe.tags.through,
+                (
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id in recipe_ids
+                    for tag_id in self.rnd.sample(
+                        tag_ids, self.rnd.randint(1, min(3, len(tag_ids)))
+                    )
+                )
+            ))
+            self.report('Подписки', self.insert(Follow, (
+                Follow(follower_id=user_id, following_id=author_id)
+                for user_id, author_id in self.pick(
+                    user_ids, user_ids, options['follows']
+                )
+                if user_id != author_id
+            )))
+            self.report('Избранное', self.insert(Favourite, (
+                Favourite(user_id=user_id, recipe_id=recipe_id)
+                for user_id, recipe_id in self.pick(
+                    user_ids, recipe_ids, options['favourites']
+                )
+            )))
+            self.report('Шоплисты', self.insert(Shoplist, (
+                Shoplist(user_id=user_id, recipe_id=recipe_id)
+                for user_id, recipe_id in self.pick(
+                    user_ids, recipe_ids, options['carts']
+                )
+            )))
+            # bulk_create не отправляет сигналы: счетчики, поисковый
+            # индекс и поколение рецептов обновляем сами
+            call_command('recount', stdout=self.stdout)
+            call_command('update_search_index', stdout=self.stdout)
+            bump_version(RECIPES_GENERATION_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с. '
+            f'Пароль пользователей {USERNAME_PREFIX}*: {PASSWORD}. '
+            'Рекомендации пересчитываются командой '
+            'build_recommendations --full.'
+        ))
+
+    def insert(self, model, objects):
+        """bulk_create пачками, чтобы не держать все строки в памяти."""
+        objects = iter(objects)
+        total = 0
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                return total
+            model.objects.bulk_create(batch)
+            total += len(batch)
+
+    def report(self, title, count):
+        self.stdout.write(f'{title}: {count}')
+
+    def create_users(self, count):
+        # Хеш пароля считается долго, поэтому он общий для всех
+        password = make_password(PASSWORD)
+        self.report('Пользователи', self.insert(User, (
+            User(
+                username=f'{USERNAME_PREFIX}{number}',
+                email=f'{USERNAME_PREFIX}{number}@example.com',
+                first_name='Bench',
+                last_name=f'User {number}',
+                password=password,
+            )
+            for number in range(count)
+        )))
+        # На SQLite bulk_create не возвращает id, читаем их из базы
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_recipes(self, user_ids, count):
+        authors = self.rnd.choices(
+            user_ids, cum_weights=zipf_weights(len(user_ids)), k=count
+        )
+        self.report('Рецепты', self.insert(Recipe, (
+            Recipe(
+                name=f'Рецепт {number}',
+                author_id=author_id,
+                text=f'Описание рецепта {number}.',
+                image=IMAGE,
+                cooking_time=self.rnd.randint(5, 180),
+            )
+            for number, author_id in enumerate(authors)
+        )))
+        return list(Recipe.objects.filter(
+            author__username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def recipe_ingredients(self, recipe_ids, ingredient_ids, average):
+        for recipe_id in recipe_ids:
+            count = round(self.rnd.gauss(average, average / 3))
+            count = max(2, min(count, 2 * average, len(ingredient_ids)))
+            for ingredient_id in self.rnd.sample(ingredient_ids, count):
+                yield IngredientRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rnd.randint(1, 500),
+                )
+
+    def pick(self, user_ids, targets, average):
+        """
+        Пары (пользователь, объект) без повторов: у каждого пользователя
+        от 0 до 2 * average объектов, популярные выбираются чаще.
+        """
+        targets = list(targets)
+        self.rnd.shuffle(targets)
+        weights = zipf_weights(len(targets))
+        for user_id in user_ids:
+            count = min(self.rnd.randint(0, 2 * average), len(targets))
+            picked = set()
+            # Повторы при выборе по весам отбрасываются, добираем
+            for _ in range(5):
+                if len(picked) >= count:
+                    break
+                picked.update(self.rnd.choices(
+                    targets, cum_weights=weights, k=count - len(picked)
+                ))
+            for target in picked:
+                yield user_id, target
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.shopping_list import get_cache_stats
+from foodgram_backend.cache import is_process_local
+
+
+class Command(BaseCommand):
+    help = (
+        'Попадания и промахи кэша списков покупок. Счетчики копят '
+        'воркеры в кэше Django, поэтому нужен общий кэш (REDIS_URL)'
+    )
+
+    def handle(self, *args, **options):
+        if is_process_local():
+            raise CommandError(
+                'Кэш в памяти процесса: счетчики воркеров отсюда не видны. '
+                'Задайте REDIS_URL.'
+            )
+        stats = get_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total * 100 if total else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {ratio:.1f}%'
+        ))
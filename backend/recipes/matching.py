@@ -0,0 +1,253 @@
+"""
+Подбор рецептов по имеющимся ингредиентам.
+
+Каждый воркер держит в памяти обратный индекс в виде битовых множеств:
+для ингредиента - целое число, в котором бит с номером id рецепта
+установлен, если рецепт его содержит. Число ингредиентов рецепта
+хранится "по разрядам": k-е число содержит k-й бит количества для всех
+рецептов сразу. Покрытие запроса считается тем же поразрядным
+сложением битовых множеств запрошенных ингредиентов, поэтому время
+зависит от числа ингредиентов в запросе, а не от числа рецептов
+(и обходится без JOIN на каждый ингредиент).
+
+Индекс загружается целиком один раз, дальше обновляется частично:
+при смене поколения рецептов (сохранение или удаление рецепта)
+перечитываются только рецепты с updated_at не раньше последнего
+учтенного (с запасом MATCHING_SYNC_OVERLAP на долгие транзакции),
+а удаленные убираются по списку существующих id.
+"""
+import threading
+from array import array
+from datetime import timedelta
+
+from django.db.models import Max
+
+from foodgram_backend.constants import MATCHING_SYNC_OVERLAP
+from foodgram_backend.replicas import use_primary
+from .models import IngredientRecipe, Recipe
+from .versions import RECIPES_DELETED_KEY, RECIPES_GENERATION_KEY, get_version
+
+_lock = threading.Lock()
+_index = None
+
+
+def add_planes(planes, mask):
+    """Прибавляет 1 всем рецептам из mask к поразрядному счетчику."""
+    carry = mask
+    for position, plane in enumerate(planes):
+        if not carry:
+            break
+        planes[position], carry = plane ^ carry, plane & carry
+    if carry:
+        planes.append(carry)
+
+
+def subtract_planes(minuend, subtrahend):
+    """Поразрядная разность счетчиков, уменьшаемое не меньше вычитаемого."""
+    result = []
+    borrow = 0
+    for position in range(len(minuend)):
+        a = minuend[position]
+        b = subtrahend[position] if position < len(subtrahend) else 0
+        result.append(a ^ b ^ borrow)
+        borrow = (~a & (b | borrow)) | (a & b & borrow)
+    return result
+
+
+def iter_bits(mask):
+    """id из битового множества, начиная с больших (новых рецептов)."""
+    bits = bin(mask)
+    last = len(bits) - 1
+    position = bits.find('1', 2)
+    while position != -1:
+        yield last - position
+        position = bits.find('1', position + 1)
+
+
+class MatchResult:
+    """
+    Выдача, упорядоченная по числу недостающих ингредиентов, внутри
+    группы - новые рецепты выше. id извлекаются только для запрошенного
+    среза, поэтому результат можно передать в пагинатор.
+    """
+
+    def __init__(self, groups):
+        # (сколько не хватает, битовое множество рецептов, их число)
+        self.groups = [
+            (missing, mask, bin(mask).count('1'))
+            for missing, mask in groups if mask
+        ]
+
+    def __len__(self):
+        return sum(size for _, _, size in self.groups)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError('MatchResult поддерживает только срезы')
+        start, stop, _ = item.indices(len(self))
+        result = []
+        for missing, mask, size in self.groups:
+            if start >= size:
+                start, stop = start - size, stop - size
+                continue
+            for number, recipe_id in enumerate(iter_bits(mask)):
+                if number >= stop:
+                    break
+                if number >= start:
+                    result.append((recipe_id, missing))
+            if stop <= size:
+                break
+            start, stop = 0, stop - size
+        return result
+
+
+def to_mask(recipe_ids, size):
+    """Битовое множество из списка id, собирается за один проход."""
+    bitmap = bytearray(size)
+    for recipe_id in recipe_ids:
+        bitmap[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+class MatchingIndex:
+    """Индекс процесса, все чтения и изменения - под self.lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = get_version(RECIPES_GENERATION_KEY)
+        self.deleted = get_version(RECIPES_DELETED_KEY)
+        self.synced_at = Recipe.objects.aggregate(
+            last=Max('updated_at')
+        )['last']
+        ingredients = {}
+        rows = IngredientRecipe.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        )
+        for recipe_id, ingredient_id in rows.iterator():
+            ingredients.setdefault(recipe_id, []).append(ingredient_id)
+        self.ingredients = {
+            recipe_id: array('I', sorted(set(ingredient_ids)))
+            for recipe_id, ingredient_ids in ingredients.items()
+        }
+        # Полная загрузка: битовые множества собираются сразу целиком,
+        # а не по одному рецепту
+        size = max(self.ingredients, default=0) // 8 + 1
+        postings = {}
+        size_planes = []
+        for recipe_id, ingredient_ids in self.ingredients.items():
+            for ingredient_id in ingredient_ids:
+                postings.setdefault(ingredient_id, []).append(recipe_id)
+            count = len(ingredient_ids)
+            while count >> len(size_planes):
+                size_planes.append([])
+            for position, plane in enumerate(size_planes):
+                if count >> position & 1:
+                    plane.append(recipe_id)
+        self.postings = {
+            ingredient_id: to_mask(recipe_ids, size)
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self.size_planes = [
+            to_mask(recipe_ids, size) for recipe_ids in size_planes
+        ]
+
+    def sync(self, generation, deleted):
+        """Перечитывает рецепты, измененные после прошлой синхронизации."""
+        recipes = Recipe.objects.all()
+        if self.synced_at is not None:
+            recipes = recipes.filter(
+                updated_at__gte=self.synced_at - timedelta(
+                    seconds=MATCHING_SYNC_OVERLAP
+                )
+            )
+        changed = dict(recipes.values_list('pk', 'updated_at'))
+        ingredients = {pk: [] for pk in changed}
+        rows = IngredientRecipe.objects.filter(
+            recipe_id__in=changed
+        ).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in rows:
+            ingredients[recipe_id].append(ingredient_id)
+        with self.lock:
+            for recipe_id, ingredient_ids in ingredients.items():
+                self.set_recipe(recipe_id, ingredient_ids)
+            if deleted != self.deleted:
+                existing = set(Recipe.objects.values_list('pk', flat=True))
+                for recipe_id in self.ingredients.keys() - existing:
+                    self.set_recipe(recipe_id, ())
+            latest = max(changed.values(), default=None)
+            if latest is not None and (
+                self.synced_at is None or latest > self.synced_at
+            ):
+                self.synced_at = latest
+            self.generation = generation
+            self.deleted = deleted
+
+    def set_recipe(self, recipe_id, ingredient_ids):
+        bit = 1 << recipe_id
+        old = set(self.ingredients.get(recipe_id, ()))
+        new = set(ingredient_ids)
+        for ingredient_id in old - new:
+            self.postings[ingredient_id] &= ~bit
+            if not self.postings[ingredient_id]:
+                del self.postings[ingredient_id]
+        for ingredient_id in new - old:
+            self.postings[ingredient_id] = (
+                self.postings.get(ingredient_id, 0) | bit
+            )
+        size = len(new)
+        while size >> len(self.size_planes):
+            self.size_planes.append(0)
+        for position, plane in enumerate(self.size_planes):
+            if size >> position & 1:
+                self.size_planes[position] = plane | bit
+            else:
+                self.size_planes[position] = plane & ~bit
+        if new:
+            self.ingredients[recipe_id] = array('I', sorted(new))
+        else:
+            self.ingredients.pop(recipe_id, None)
+
+    def match(self, ingredient_ids, max_missing=None):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов:
+        сначала те, что можно приготовить целиком, затем без одного и т.д.
+        """
+        with self.lock:
+            masks = [
+                self.postings[pk] for pk in set(ingredient_ids)
+                if pk in self.postings
+            ]
+            covered = 0
+            count_planes = []
+            for mask in masks:
+                covered |= mask
+                add_planes(count_planes, mask)
+            missing_planes = subtract_planes(self.size_planes, count_planes)
+        limit = (1 << len(missing_planes)) - 1
+        if max_missing is not None:
+            limit = min(limit, max_missing)
+        groups = []
+        for missing in range(limit + 1):
+            mask = covered
+            for position, plane in enumerate(missing_planes):
+                if not mask:
+                    break
+                mask &= plane if missing >> position & 1 else ~plane
+            groups.append((missing, mask))
+        return MatchResult(groups)
+
+
+def get_matching_index():
+    """Индекс процесса, догоняющий изменения рецептов."""
+    global _index
+    generation = get_version(RECIPES_GENERATION_KEY)
+    index = _index
+    if index is not None and index.generation == generation:
+        return index
+    # Индекс помечается текущим поколением, реплика могла отстать
+    with _lock, use_primary():
+        if _index is None:
+            _index = MatchingIndex()
+        elif _index.generation != generation:
+            _index.sync(generation, get_version(RECIPES_DELETED_KEY))
+        return _index
@@ -0,0 +1,52 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+from foodgram_backend.migration_utils import run_for_vendor
+
+POSTGRESQL_FORWARD = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+    'ON recipes_recipe USING gin (search_vector);',
+    # Заполняем тем же выражением, что и recipes.search
+    "UPDATE recipes_recipe SET search_vector = "
+    "setweight(to_tsvector('russian', COALESCE(name, '')), 'A') "
+    "|| setweight(to_tsvector('russian', COALESCE(("
+    "SELECT string_agg(i.name, ' ') FROM recipes_ingredientrecipe ir "
+    "JOIN recipes_ingredient i ON i.id = ir.ingredient_id "
+    "WHERE ir.recipe_id = recipes_recipe.id), '')), 'B') "
+    "|| setweight(to_tsvector('russian', COALESCE(text, '')), 'C');",
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector;',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts '
+    "USING fts5(name, ingredients, text, "
+    "tokenize='unicode61 remove_diacritics 2');",
+    'INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text) '
+    "SELECT r.id, r.name, COALESCE(("
+    "SELECT group_concat(i.name, ' ') FROM recipes_ingredientrecipe ir "
+    "JOIN recipes_ingredient i ON i.id = ir.ingredient_id "
+    "WHERE ir.recipe_id = r.id), ''), r.text FROM recipes_recipe r;",
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_fts;',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRESQL_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRESQL_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
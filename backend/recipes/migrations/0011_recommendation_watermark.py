@@ -0,0 +1,25 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=128, unique=True, verbose_name='источник')),
+                ('last_id', models.BigIntegerField(verbose_name='последний id')),
+            ],
+            options={
+                'verbose_name': 'метка рекомендаций',
+                'verbose_name_plural': 'Метки рекомендаций',
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
@@ -97,6 +98,12 @@ class Ingredient(BaseModel):
         return self.name
 
 
+class RecipeManager(models.Manager):
+    def get_queryset(self):
+        # Поисковый вектор нужен только в условиях поиска, не в выборке
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(BaseModel):
     name = models.CharField(
         max_length=NAME_MID_NUMBCHAR,
@@ -120,10 +127,36 @@ class Recipe(BaseModel):
     image = models.ImageField(
         upload_to='recipes/',
     )
+    # Пути уменьшенных копий, строятся в фоне (recipes.images)
+    image_renditions = models.JSONField(
+        default=dict,
+        editable=False,
+        verbose_name='копии изображения',
+    )
     cooking_time = models.PositiveIntegerField(
         validators=[MinValueValidator(1)],
         verbose_name='время приготовления',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    # Поисковый вектор PostgreSQL, поддерживается recipes.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Счетчики поддерживаются через F() при добавлении/удалении
+    # в избранное и шоплист, пересчитываются командой recount.
+    favourites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в избранном',
+    )
+    shoplist_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в списках покупок',
+    )
+
+    objects = RecipeManager()
 
     class Meta:
         ordering = ['-created_at']
@@ -195,6 +228,8 @@ class FavouriteShoplist(models.Model):
 
 
 class Favourite(FavouriteShoplist):
+    # Счетчик рецепта, который поддерживается этой связью
+    recipe_counter = 'favourites_count'
 
     class Meta(FavouriteShoplist.Meta):
         verbose_name = 'изранное'
@@ -202,7 +237,108 @@ class Favourite(FavouriteShoplist):
 
 
 class Shoplist(FavouriteShoplist):
+    recipe_counter = 'shoplist_count'
 
     class Meta(FavouriteShoplist.Meta):
         verbose_name = 'список покупок'
         verbose_name_plural = 'Список покупок'
+
+
+class RecipeNeighbour(models.Model):
+    """
+    Похожий рецепт: его часто добавляют в избранное и шоплист
+    те же пользователи. Заполняется командой build_recommendations.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        verbose_name='рецепт',
+    )
+    neighbour = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbour_of',
+        verbose_name='похожий рецепт',
+    )
+    count = models.PositiveIntegerField(
+        verbose_name='общих пользователей',
+    )
+    score = models.FloatField(verbose_name='сходство')
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    'recipe',
+                    'neighbour'
+                ),
+                name='uniq_recipeneighbour'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='recipes_neighbour_rank',
+            ),
+        )
+
+
+class UserRecommendation(models.Model):
+    """Рекомендация пользователю, заполняется build_recommendations."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='recommended_to',
+        verbose_name='рецепт',
+    )
+    score = models.FloatField(verbose_name='оценка')
+
+    class Meta:
+        verbose_name = 'рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    'user',
+                    'recipe'
+                ),
+                name='uniq_userrecommendation'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-score'),
+                name='recipes_recommendation_rank',
+            ),
+        )
+
+
+class RecommendationWatermark(models.Model):
+    """
+    Последний id строки избранного или шоплиста, учтенный
+    в рекомендациях. Хранится в базе, а не в кэше, чтобы частичный
+    пересчет build_recommendations работал между процессами и
+    переживал перезапуск.
+    """
+    source = models.CharField(
+        max_length=NAME_SHORT_NUMBCHAR,
+        unique=True,
+        verbose_name='источник',
+    )
+    last_id = models.BigIntegerField(verbose_name='последний id')
+
+    class Meta:
+        verbose_name = 'метка рекомендаций'
+        verbose_name_plural = 'Метки рекомендаций'
+
+    def __str__(self):
+        return f'{self.source}: {self.last_id}'
@@ -0,0 +1,248 @@
+"""
+Рекомендации "с этим рецептом также добавляют" и персональная лента.
+
+Считаются офлайн командой build_recommendations по парам
+(пользователь, рецепт) из избранного и шоплиста. Сходство рецептов -
+косинусная мера совместной встречаемости: число общих пользователей,
+деленное на корень из произведения чисел пользователей каждого рецепта.
+Разреженная матрица хранится как словарь счетчиков (строка на рецепт).
+Для рецепта сохраняется RECOMMENDATION_NEIGHBOURS ближайших
+(RecipeNeighbour), для пользователя - RECOMMENDATION_FEED_SIZE рецептов
+с наибольшей суммой сходства с его рецептами (UserRecommendation),
+так что онлайн-запрос - одна выборка по индексу.
+
+Полный пересчет строит матрицу заново. Частичный берет только строки
+избранного и шоплиста с id больше прошлых меток и обновляет соседей
+затронутых рецептов и ленты затронутых пользователей. Он приближенный:
+счетчики пар вне сохраненных соседей не хранятся, а удаления из
+избранного и шоплиста не учитываются - это исправляет периодический
+полный пересчет. Метки хранятся в таблице RecommendationWatermark
+и обновляются в одной транзакции с рекомендациями.
+"""
+import heapq
+from collections import Counter
+from math import sqrt
+
+from django.db import transaction
+from django.db.models import Max
+
+from foodgram_backend.constants import (
+    RECOMMENDATION_FEED_SIZE,
+    RECOMMENDATION_MAX_USER_ITEMS,
+    RECOMMENDATION_NEIGHBOURS
+)
+from .models import (
+    Favourite,
+    RecipeNeighbour,
+    RecommendationWatermark,
+    Shoplist,
+    UserRecommendation
+)
+
+SOURCES = {
+    'favourite': Favourite,
+    'shoplist': Shoplist,
+}
+
+
+def get_watermark():
+    """Последние id строк избранного и шоплиста."""
+    return {
+        name: model.objects.aggregate(last=Max('pk'))['last'] or 0
+        for name, model in SOURCES.items()
+    }
+
+
+def load_watermark():
+    """Метки прошлого пересчета или None, если его не было."""
+    saved = dict(RecommendationWatermark.objects.values_list(
+        'source', 'last_id'
+    ))
+    if saved.keys() != SOURCES.keys():
+        return None
+    return saved
+
+
+def save_watermark(watermark):
+    for name, last_id in watermark.items():
+        RecommendationWatermark.objects.update_or_create(
+            source=name, defaults={'last_id': last_id}
+        )
+
+
+def load_user_items(watermark, previous=None, **filters):
+    """
+    Рецепты пользователей: user_id -> {recipe_id: строка старая}.
+    Старыми считаются строки с id не больше меток previous.
+    """
+    user_items = {}
+    for name, model in SOURCES.items():
+        rows = model.objects.filter(
+            pk__lte=watermark[name], **filters
+        ).values_list('pk', 'user_id', 'recipe_id')
+        for pk, user_id, recipe_id in rows.iterator():
+            is_old = previous is not None and pk <= previous[name]
+            items = user_items.setdefault(user_id, {})
+            items[recipe_id] = items.get(recipe_id, False) or is_old
+    return user_items
+
+
+def limit_items(items):
+    """Для активных пользователей берем только новые рецепты."""
+    return sorted(items, reverse=True)[:RECOMMENDATION_MAX_USER_ITEMS]
+
+
+def get_popularity(recipe_ids):
+    """Число разных пользователей у каждого рецепта."""
+    users = {}
+    for model in SOURCES.values():
+        rows = model.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'user_id')
+        for recipe_id, user_id in rows.iterator():
+            users.setdefault(recipe_id, set()).add(user_id)
+    return Counter({pk: len(user_ids) for pk, user_ids in users.items()})
+
+
+def top_neighbours(recipe_id, counts, popularity):
+    """RECOMMENDATION_NEIGHBOURS соседей: (id, общих, сходство)."""
+    candidates = (
+        (
+            neighbour_id,
+            count,
+            count / sqrt(popularity[recipe_id] * popularity[neighbour_id]),
+        )
+        for neighbour_id, count in counts.items()
+        if neighbour_id != recipe_id and count > 0
+        and popularity[recipe_id] and popularity[neighbour_id]
+    )
+    return heapq.nlargest(
+        RECOMMENDATION_NEIGHBOURS,
+        candidates,
+        key=lambda row: (row[2], row[1], row[0])
+    )
+
+
+def get_feed(items, neighbours):
+    """Лента пользователя: сумма сходства с его рецептами."""
+    scores = Counter()
+    for recipe_id in items:
+        for neighbour_id, _, score in neighbours.get(recipe_id, ()):
+            if neighbour_id not in items:
+                scores[neighbour_id] += score
+    return scores.most_common(RECOMMENDATION_FEED_SIZE)
+
+
+def save_neighbours(neighbours):
+    RecipeNeighbour.objects.bulk_create(
+        (
+            RecipeNeighbour(
+                recipe_id=recipe_id,
+                neighbour_id=neighbour_id,
+                count=count,
+                score=score,
+            )
+            for recipe_id, rows in neighbours.items()
+            for neighbour_id, count, score in rows
+        ),
+        batch_size=1000,
+    )
+
+
+def save_feeds(user_items, neighbours):
+    UserRecommendation.objects.bulk_create(
+        (
+            UserRecommendation(
+                user_id=user_id, recipe_id=recipe_id, score=score
+            )
+            for user_id, items in user_items.items()
+            for recipe_id, score in get_feed(set(items), neighbours)
+        ),
+        batch_size=1000,
+    )
+
+
+def build_all():
+    """Полный пересчет соседей и лент."""
+    watermark = get_watermark()
+    user_items = load_user_items(watermark)
+    matrix = {}
+    popularity = Counter()
+    for items in user_items.values():
+        items = limit_items(items)
+        popularity.update(items)
+        for recipe_id in items:
+            matrix.setdefault(recipe_id, Counter()).update(items)
+    neighbours = {
+        recipe_id: top_neighbours(recipe_id, counts, popularity)
+        for recipe_id, counts in matrix.items()
+    }
+    with transaction.atomic():
+        RecipeNeighbour.objects.all().delete()
+        UserRecommendation.objects.all().delete()
+        save_neighbours(neighbours)
+        save_feeds(user_items, neighbours)
+        save_watermark(watermark)
+    return len(neighbours), len(user_items)
+
+
+def refresh():
+    """
+    Частичный пересчет по новым строкам избранного и шоплиста.
+    Без сохраненных меток выполняется полный.
+    """
+    previous = load_watermark()
+    if previous is None:
+        return build_all()
+    watermark = get_watermark()
+    user_ids = set()
+    for name, model in SOURCES.items():
+        user_ids.update(model.objects.filter(
+            pk__gt=previous[name], pk__lte=watermark[name]
+        ).values_list('user_id', flat=True))
+    if not user_ids:
+        return 0, 0
+    user_items = load_user_items(watermark, previous, user_id__in=user_ids)
+    # Приращения матрицы: новые рецепты в паре со старыми и друг с другом
+    delta = {}
+    for items in user_items.values():
+        kept = limit_items(items)
+        new = [pk for pk in kept if not items[pk]]
+        for recipe_id in new:
+            delta.setdefault(recipe_id, Counter()).update(kept)
+            for other_id in kept:
+                if items[other_id]:
+                    delta.setdefault(other_id, Counter())[recipe_id] += 1
+    affected = set(delta)
+    matrix = {recipe_id: Counter() for recipe_id in affected}
+    for recipe_id, neighbour_id, count in RecipeNeighbour.objects.filter(
+        recipe_id__in=affected
+    ).values_list('recipe_id', 'neighbour_id', 'count'):
+        matrix[recipe_id][neighbour_id] = count
+    for recipe_id, counts in delta.items():
+        matrix[recipe_id].update(counts)
+    popularity = get_popularity(
+        affected.union(*(counts.keys() for counts in matrix.values()))
+    )
+    neighbours = {
+        recipe_id: top_neighbours(recipe_id, counts, popularity)
+        for recipe_id, counts in matrix.items()
+    }
+    with transaction.atomic():
+        RecipeNeighbour.objects.filter(recipe_id__in=affected).delete()
+        save_neighbours(neighbours)
+        # Соседей остальных рецептов пользователя берем из таблицы
+        all_items = set().union(*user_items.values())
+        stored = {}
+        for recipe_id, neighbour_id, count, score in (
+            RecipeNeighbour.objects.filter(
+                recipe_id__in=all_items
+            ).values_list('recipe_id', 'neighbour_id', 'count', 'score')
+        ):
+            stored.setdefault(recipe_id, []).append(
+                (neighbour_id, count, score)
+            )
+        UserRecommendation.objects.filter(user_id__in=user_ids).delete()
+        save_feeds(user_items, stored)
+        save_watermark(watermark)
+    return len(affected), len(user_ids)
@@ -0,0 +1,141 @@
+"""
+Полнотекстовый поиск рецептов по названию, ингредиентам и описанию.
+
+PostgreSQL: поле Recipe.search_vector (tsvector с весами A, B, C)
+под GIN-индексом. SQLite: виртуальная таблица FTS5, rowid которой
+совпадает с id рецепта. Индекс пересчитывается после коммита
+сохранения рецепта или изменения ингредиента, целиком его
+перестраивает команда update_search_index.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector
+)
+from django.db import connection, transaction
+from django.db.models import (
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+    TextField,
+    Value
+)
+from django.db.models.expressions import RawSQL
+
+from .models import IngredientRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+# Веса bm25 для колонок FTS5: название, ингредиенты, описание
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+
+def get_search_vector():
+    ingredient_names = Subquery(
+        IngredientRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names'),
+        output_field=TextField(),
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_index(recipe_ids=None):
+    """Пересчитывает индекс рецептов recipe_ids, None - всех."""
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    if connection.vendor == 'postgresql':
+        return recipes.update(search_vector=get_search_vector())
+    if connection.vendor != 'sqlite':
+        return 0
+    names = {}
+    for recipe_id, name in IngredientRecipe.objects.filter(
+        recipe__in=recipes
+    ).values_list('recipe_id', 'ingredient__name'):
+        names.setdefault(recipe_id, []).append(name)
+    rows = [
+        (pk, name, ' '.join(names.get(pk, ())), text)
+        for pk, name, text in recipes.values_list('pk', 'name', 'text')
+    ]
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        else:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in recipe_ids]
+            )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+            f'VALUES (%s, %s, %s, %s)',
+            rows
+        )
+    return len(rows)
+
+
+def schedule_search_update(recipe_ids):
+    """Обновление индекса после коммита, когда записаны и ингредиенты."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: update_search_index(recipe_ids))
+
+
+def remove_from_search_index(recipe_id):
+    # В PostgreSQL вектор удаляется вместе со строкой рецепта
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (recipe_id,)
+            )
+
+
+def search_recipes(queryset, value):
+    """
+    Оставляет рецепты, подходящие под запрос, и сортирует
+    по релевантности: аннотация search_rank, больше - релевантнее.
+    """
+    value = value.strip()
+    if not value:
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-created_at')
+    if connection.vendor == 'sqlite':
+        # Каждое слово - префикс в кавычках, синтаксис FTS5 не передаем
+        match = ' '.join(
+            '"{}"*'.format(term.replace('"', '""'))
+            for term in value.split()
+        )
+        # Отбор - один несвязанный подзапрос MATCH, ранг считается
+        # только для отобранных рецептов. bm25 отрицательный (меньше -
+        # релевантнее), меняем знак, как у SearchRank
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, %s, %s, %s) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND {FTS_TABLE}.rowid = {Recipe._meta.db_table}.id',
+            (*FTS_WEIGHTS, match),
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,)
+        )).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+    return queryset.filter(
+        Q(name__icontains=value)
+        | Q(text__icontains=value)
+        | Q(ingredients__name__icontains=value)
+    ).distinct().annotate(search_rank=Value(0.0, output_field=FloatField()))
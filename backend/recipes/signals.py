@@ -0,0 +1,152 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.shopping_list import (
+    invalidate_recipe_shopping_lists,
+    invalidate_shopping_lists
+)
+from users.models import Follow
+from .catalog import invalidate_catalog
+from .images import schedule_renditions
+from .search import remove_from_search_index, schedule_search_update
+from .models import (
+    Favourite,
+    Ingredient,
+    IngredientRecipe,
+    Measurement,
+    Recipe,
+    Shoplist,
+    Tag
+)
+from .versions import (
+    RECIPES_DELETED_KEY,
+    RECIPES_GENERATION_KEY,
+    bump_user_profile_version,
+    bump_user_relations_version,
+    bump_version
+)
+
+User = get_user_model()
+
+
+def change_counter(queryset, counter, delta):
+    """Меняет счетчик на delta, не опуская ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{counter}__gt': 0})
+    queryset.update(**{counter: F(counter) + delta})
+
+
+@receiver(post_save, sender=Favourite)
+@receiver(post_save, sender=Shoplist)
+def relation_added(sender, instance, created, **kwargs):
+    """Счетчики ведутся здесь, чтобы их не обходили админка и shell."""
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            sender.recipe_counter, 1
+        )
+
+
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=Shoplist)
+def relation_removed(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        sender.recipe_counter, -1
+    )
+
+
+@receiver(post_save, sender=Favourite)
+@receiver(post_save, sender=Shoplist)
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=Shoplist)
+def user_relations_changed(sender, instance, **kwargs):
+    """Флаги пользователя и его список покупок устарели."""
+    bump_user_relations_version(instance.user_id)
+    if sender is Shoplist:
+        invalidate_shopping_lists([instance.user_id])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    bump_user_relations_version(instance.follower_id)
+
+
+@receiver(post_save, sender=User)
+def user_profile_changed(sender, instance, created, update_fields, **kwargs):
+    """Автор входит в ответы о рецептах, правка профиля их меняет."""
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    bump_user_profile_version(instance.pk)
+    # Списки и кэш ответов анонимам держатся на поколении рецептов
+    bump_version(RECIPES_GENERATION_KEY)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    """Правка ингредиентов, например в админке, меняет шоплисты."""
+    invalidate_recipe_shopping_lists(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Measurement)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Measurement)
+@receiver(post_delete, sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    """Сбрасываем кэш справочников при изменениях из админки."""
+    invalidate_catalog()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, **kwargs):
+    """Удаление не меняет updated_at оставшихся, поэтому ведем метку."""
+    bump_version(RECIPES_DELETED_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, **kwargs):
+    """Новое поколение рецептов сбрасывает кэш ответов анонимам."""
+    bump_version(RECIPES_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    """Новое изображение отправляем на построение копий."""
+    schedule_renditions(instance)
+    schedule_search_update([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed_from_search(sender, instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Переименование ингредиента меняет индекс его рецептов."""
+    if not created:
+        schedule_search_update(
+            instance.ingredient_recipes.values_list('recipe_id', flat=True)
+        )
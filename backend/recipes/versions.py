@@ -0,0 +1,51 @@
+"""
+Метки версий в кэше Django. Меткой служит время последнего изменения
+в наносекундах: она уникальна и одновременно дает дату изменения
+для заголовка Last-Modified.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+RECIPES_DELETED_KEY = 'recipes:deleted'
+RECIPES_GENERATION_KEY = 'recipes:generation'
+USER_RELATIONS_KEY = 'users:{user_id}:relations'
+USER_PROFILE_KEY = 'users:{user_id}:profile'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Метки нет (кэш очищен) - считаем, что изменение было сейчас
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Новая метка после коммита текущей транзакции."""
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+def version_to_datetime(version):
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def get_user_relations_version(user_id):
+    """Версия избранного, шоплиста и подписок пользователя."""
+    return get_version(USER_RELATIONS_KEY.format(user_id=user_id))
+
+
+def bump_user_relations_version(user_id):
+    bump_version(USER_RELATIONS_KEY.format(user_id=user_id))
+
+
+def get_user_profile_version(user_id):
+    """Версия имени и других полей пользователя в ответах о рецептах."""
+    return get_version(USER_PROFILE_KEY.format(user_id=user_id))
+
+
+def bump_user_profile_version(user_id):
+    bump_version(USER_PROFILE_KEY.format(user_id=user_id))
@@ -41,5 +41,6 @@ class ModifiedUserAdmin(UserAdmin):
     get_followers_count.short_description = 'Подписчики'
 
     def get_recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
     get_recipe_count.short_description = 'Количество рецептов'
+    get_recipe_count.admin_order_field = 'recipes_count'
@@ -34,6 +34,12 @@ class ModifiedUser(AbstractUser):
         max_length=USER_FIELDS_NUMBCHAR,
         verbose_name='Пароль',
     )
+    # Поддерживается при создании/удалении рецептов, см. команду recount
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+    )
 
     class Meta:
         verbose_name = 'Пользователь'